@@ -1,7 +1,14 @@
 import numpy as np
-import sys
-import matplotlib.pyplot as plt  # type: ignore[import-untyped]
-import seaborn as sns  # type: ignore[import-untyped]
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+# matplotlib / seaborn are imported only when plotting (see _plotting), so the solver can be
+# imported by the oTree app and by worker processes without them
 
 # --- CONFIGURATION & PRIORS ---
 # Defined from your problem statement
@@ -9,9 +16,8 @@ PRIOR_A = {0.8: 0.30, 0.6: 0.30, 0.4: 0.20, 0.2: 0.20}
 PRIOR_B = {0.8: 0.20, 0.6: 0.20, 0.4: 0.30, 0.2: 0.30}
 HORIZON = 20
 SIMULATION_RUNS = 5000
-
-# Increase recursion depth just in case, though 20 is shallow
-sys.setrecursionlimit(2000)
+# Constants.switching_cost / Constants.bonus_per_correct (5¢ / 20¢), in units of correct answers
+SWITCHING_COST = 0.25
 
 # --- 1. THE MATH ENGINE (Dynamic Programming) ---
 
@@ -33,184 +39,656 @@ def update_prior(prior, success):
         new_prior[acc] /= total_prob
     return new_prior
 
-# Memoization Dictionary
-memo = {}
+def posterior_weights(prior, max_count):
+    """
+    Posterior over the accuracy levels after s successes and f failures, for every s, f <= max_count.
+    Returns an array indexed as weights[s, f, k], k following the order of list(prior).
+    """
+    acc = np.array(list(prior.keys()), dtype=float)
+    weights = np.array(list(prior.values()), dtype=float)
+    counts = np.arange(max_count + 1)
+    with np.errstate(divide='ignore'):
+        log_post = (counts[:, None, None] * np.log(acc)
+                    + counts[None, :, None] * np.log1p(-acc)
+                    + np.log(weights))
+    # Work in log space so long horizons do not underflow
+    log_post -= log_post.max(axis=2, keepdims=True)
+    post = np.exp(log_post)
+    return post / post.sum(axis=2, keepdims=True)
 
-def solve_dp(sA, fA, sB, fB, priorA, priorB):
+def posterior_means(prior, max_count):
     """
-    Returns the Q-values (Expected Future Reward) for choosing A and B.
-    State: (wins_A, losses_A, wins_B, losses_B)
+    Expected accuracy after s successes and f failures, for every s, f <= max_count.
+    Returns an array indexed as means[s, f]; means[0, 0] equals get_expected_accuracy(prior).
     """
-    rounds_played = sA + fA + sB + fB
-    if rounds_played >= HORIZON:
-        return 0.0, 0.0
-    
-    # Check Memoization
-    state_key = (sA, fA, sB, fB)
-    if state_key in memo:
-        return memo[state_key]
+    return posterior_weights(prior, max_count) @ np.array(list(prior.keys()), dtype=float)
 
-    # --- CALC VALUE FOR CHOOSING A ---
-    exp_A = get_expected_accuracy(priorA)
-    
-    # Future if A succeeds
-    pA_succ = update_prior(priorA, True)
-    future_A_succ = max(solve_dp(sA + 1, fA, sB, fB, pA_succ, priorB))
-    
-    # Future if A fails
-    pA_fail = update_prior(priorA, False)
-    future_A_fail = max(solve_dp(sA, fA + 1, sB, fB, pA_fail, priorB))
-    
-    q_A = exp_A * (1 + future_A_succ) + (1 - exp_A) * (0 + future_A_fail)
+# --- State lattice ---
+# Reachable states are (sA, fA, sB, fB) with sA + fA + sB + fB = t < horizon.
+# They are packed layer by layer (t = 0, 1, ...) and lexicographically within a layer,
+# so a whole Q-table is one flat array instead of a sparse (H+1)^4 cube.
 
-    # --- CALC VALUE FOR CHOOSING B ---
-    exp_B = get_expected_accuracy(priorB)
-    
-    # Future if B succeeds
-    pB_succ = update_prior(priorB, True)
-    future_B_succ = max(solve_dp(sA, fA, sB + 1, fB, priorA, pB_succ))
-    
-    # Future if B fails
-    pB_fail = update_prior(priorB, False)
-    future_B_fail = max(solve_dp(sA, fA, sB, fB + 1, priorA, pB_fail))
-    
-    q_B = exp_B * (1 + future_B_succ) + (1 - exp_B) * (0 + future_B_fail)
-    
-    # Store and Return
-    memo[state_key] = (q_A, q_B)
+def _comb2(n):
+    return n * (n - 1) // 2
+
+def _comb3(n):
+    return n * (n - 1) * (n - 2) // 6
+
+def _comb4(n):
+    return n * (n - 1) * (n - 2) * (n - 3) // 24
+
+def num_states(horizon):
+    """Number of lattice states with fewer than `horizon` rounds played."""
+    return _comb4(horizon + 3)
+
+def _layer_size(t):
+    return _comb3(t + 3)
+
+def _local_index(t, sA, fA, sB):
+    """Position of (sA, fA, sB, t - sA - fA - sB) inside layer t."""
+    u = t - sA
+    return (_layer_size(t) - _comb3(u + 3)) + (_comb2(u + 2) - _comb2(u - fA + 2)) + sB
+
+def state_index(sA, fA, sB, fB):
+    """Flat lattice index of one or many states (accepts scalars or integer arrays)."""
+    sA, fA, sB, fB = (np.asarray(x, dtype=np.int64) for x in (sA, fA, sB, fB))
+    t = sA + fA + sB + fB
+    return num_states(t) + _local_index(t, sA, fA, sB)
+
+def layer_states(t):
+    """All states with t rounds played, as (sA, fA, sB, fB) arrays in lattice order."""
+    sA, fA = np.indices((t + 1, t + 1)).reshape(2, -1)
+    keep = sA + fA <= t
+    sA, fA = sA[keep], fA[keep]
+    rest = t - sA - fA + 1  # number of (sB, fB) splits for each (sA, fA)
+    starts = np.cumsum(rest) - rest
+    sB = np.arange(rest.sum()) - np.repeat(starts, rest)
+    sA, fA = np.repeat(sA, rest), np.repeat(fA, rest)
+    return sA, fA, sB, t - sA - fA - sB
+
+class PolicyTable:
+    """
+    Solved Q-values for every reachable state of one (priorA, priorB, horizon) game.
+    q[i, 0] / q[i, 1] = expected future correct answers from choosing A / B in state i,
+    where i = state_index(sA, fA, sB, fB).
+    With a switching cost the table is q[i, last, action]: last = advisor chosen in the previous
+    round (0 = A, 1 = B), values net of switching costs. The first round of a block is free,
+    so both `last` rows of the start state are equal.
+    """
+    def __init__(self, q, prior_a, prior_b, horizon, switching_cost=0.0):
+        self.q = q
+        self.prior_a = prior_a
+        self.prior_b = prior_b
+        self.horizon = horizon
+        self.switching_cost = switching_cost
+        self._policy = None
+
+    @property
+    def policy(self):
+        """
+        Optimal action per state: 0 = A, 1 = B (ties go to A, as in the original solver).
+        Shape (num_states,), or (num_states, 2) indexed by the last choice with a switching cost.
+        """
+        if self._policy is None:
+            self._policy = (self.q[..., 1] > self.q[..., 0]).astype(np.int8)
+        return self._policy
+
+    @property
+    def value(self):
+        """Expected number of correct answers (net of switching costs) under the optimal policy."""
+        return float(self.q[0].max())
+
+    def q_values(self, sA, fA, sB, fB, last=0):
+        """(qA, qB) for one state, or two arrays for arrays of states. `last` only matters with a switching cost."""
+        q = self.q[state_index(sA, fA, sB, fB)]
+        if self.q.ndim == 3:
+            q = np.take_along_axis(q, np.broadcast_to(np.asarray(last), q.shape[:-2])[..., None, None], axis=-2)[..., 0, :]
+        return q[..., 0], q[..., 1]
+
+def _layer_q(t, v_next, mean_A, mean_B, v_next_B=None):
+    """
+    Q-values (qA, qB) of every state in layer t, given the state values of layer t + 1.
+    With a switching cost, v_next / v_next_B are the layer t + 1 values after choosing A / B.
+    """
+    if v_next_B is None:
+        v_next_B = v_next
+    sA, fA, sB, fB = layer_states(t)
+    exp_A = mean_A[sA, fA]
+    exp_B = mean_B[sB, fB]
+
+    # Values of the four successor states in layer t + 1
+    future_A_succ = v_next[_local_index(t + 1, sA + 1, fA, sB)]
+    future_A_fail = v_next[_local_index(t + 1, sA, fA + 1, sB)]
+    future_B_succ = v_next_B[_local_index(t + 1, sA, fA, sB + 1)]
+    future_B_fail = v_next_B[_local_index(t + 1, sA, fA, sB)]  # fB + 1 keeps (sA, fA, sB)
+
+    q_A = exp_A * (1 + future_A_succ) + (1 - exp_A) * future_A_fail
+    q_B = exp_B * (1 + future_B_succ) + (1 - exp_B) * future_B_fail
     return q_A, q_B
 
+def _backward_induction(mean_A, mean_B, horizon, switching_cost=0.0):
+    """
+    Bottom-up backward induction over the state lattice, one layer (round) at a time.
+    mean_A / mean_B are posterior_means tables covering at least `horizon` observations.
+    Returns the (num_states, 2) array of Q-values for choosing A and B, or the
+    (num_states, 2, 2) [state, last, action] array when there is a switching cost.
+    """
+    if not switching_cost:
+        q = np.empty((num_states(horizon), 2))
+        v_next = np.zeros(_layer_size(horizon))  # No rounds left: no more reward
+        for t in range(horizon - 1, -1, -1):
+            layer_q = q[num_states(t):num_states(t + 1)]
+            layer_q[:, 0], layer_q[:, 1] = _layer_q(t, v_next, mean_A, mean_B)
+            v_next = layer_q.max(axis=1)
+        return q
+
+    q = np.empty((num_states(horizon), 2, 2))
+    v_next = np.zeros((_layer_size(horizon), 2))  # Indexed by the advisor chosen last
+    for t in range(horizon - 1, -1, -1):
+        layer_q = q[num_states(t):num_states(t + 1)]
+        q_A, q_B = _layer_q(t, v_next[:, 0], mean_A, mean_B, v_next_B=v_next[:, 1])
+        cost = switching_cost if t > 0 else 0.0  # First trial of a block is never charged
+        layer_q[:, 0, 0], layer_q[:, 0, 1] = q_A, q_B - cost
+        layer_q[:, 1, 0], layer_q[:, 1, 1] = q_A - cost, q_B
+        v_next = layer_q.max(axis=2)
+    return q
+
+def prior_key(prior):
+    """Hashable, order-independent key for a discrete prior dict."""
+    return tuple(sorted((float(acc), float(prob)) for acc, prob in prior.items()))
+
+class DPSolver:
+    """
+    Solves games and caches the results. Solved tables are keyed on (priorA, priorB, horizon,
+    switching_cost) and evicted least-recently-used beyond `max_tables`; posterior-mean tables are kept per prior
+    and shared by every game that uses that prior.
+    """
+    def __init__(self, max_tables=8):
+        self.max_tables = max_tables
+        self.hits = 0
+        self.misses = 0
+        self._tables = OrderedDict()
+        self._means = {}
+
+    def posterior_means(self, prior, max_count):
+        """Cached posterior_means(prior, max_count); grown in place when a longer horizon is asked for."""
+        key = prior_key(prior)
+        means = self._means.get(key)
+        if means is None or means.shape[0] <= max_count:
+            means = posterior_means(prior, max_count)
+            self._means[key] = means
+        return means[:max_count + 1, :max_count + 1]
+
+    def solve(self, priorA, priorB, horizon=HORIZON, switching_cost=0.0):
+        key = (prior_key(priorA), prior_key(priorB), horizon, float(switching_cost))
+        table = self._tables.get(key)
+        if table is not None:
+            self.hits += 1
+            self._tables.move_to_end(key)
+            return table
+
+        self.misses += 1
+        q = _backward_induction(self.posterior_means(priorA, horizon),
+                                self.posterior_means(priorB, horizon), horizon, switching_cost)
+        table = PolicyTable(q, priorA, priorB, horizon, float(switching_cost))
+        self._tables[key] = table
+        while len(self._tables) > self.max_tables:
+            self._tables.popitem(last=False)
+        return table
+
+    def cache_info(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'tables': len(self._tables), 'max_tables': self.max_tables,
+                'priors': len(self._means)}
+
+    def clear(self):
+        self._tables.clear()
+        self._means.clear()
+        self.hits = self.misses = 0
+
+# Shared solver used by the module-level helpers
+solver = DPSolver()
+
+def solve_dp(priorA, priorB, horizon=HORIZON, switching_cost=0.0):
+    """
+    Returns the PolicyTable for (priorA, priorB, horizon), solving it only on a cache miss.
+    switching_cost > 0 (e.g. SWITCHING_COST) solves the switching-cost treatment instead.
+    """
+    return solver.solve(priorA, priorB, horizon, switching_cost)
+
+def evaluate_policy(actions, priorA, priorB, horizon=HORIZON, switching_cost=0.0):
+    """
+    Expected number of correct answers, net of switching costs, when following a fixed policy
+    instead of the optimal one. `actions` holds 0 (A) or 1 (B) for every lattice state, like
+    PolicyTable.policy; a (num_states, 2) array additionally depends on the last choice.
+    """
+    mean_A = solver.posterior_means(priorA, horizon)
+    mean_B = solver.posterior_means(priorB, horizon)
+    actions = np.asarray(actions)
+    if actions.ndim == 1:
+        actions = np.stack([actions, actions], axis=1)
+    v_next = np.zeros((_layer_size(horizon), 2))
+    for t in range(horizon - 1, -1, -1):
+        q_A, q_B = _layer_q(t, v_next[:, 0], mean_A, mean_B, v_next_B=v_next[:, 1])
+        cost = switching_cost if t > 0 else 0.0
+        pick_B = actions[num_states(t):num_states(t + 1)] == 1
+        v_next = np.stack([np.where(pick_B[:, 0], q_B - cost, q_A),
+                           np.where(pick_B[:, 1], q_B, q_A - cost)], axis=1)
+    return float(v_next[0, 0])
+
+# --- 1b. POLICY ARTIFACTS ON DISK ---
+# Solved tables are saved as <key>.q.npy plus a <key>.json sidecar, where the key hashes
+# (version, priors, horizon, switching cost). Loading uses mmap_mode='r', so it takes milliseconds
+# and every process on the machine (server processes, simulation workers) shares the same pages.
+
+ARTIFACT_VERSION = 2  # 2: priors stored in order; simulations drawn from sorted levels
+ARTIFACT_DIR = os.environ.get(
+    'GITTINS_ARTIFACT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '_artifacts'))
+
+def artifact_key(prior_a, prior_b, horizon, switching_cost=0.0):
+    payload = repr((ARTIFACT_VERSION, prior_key(prior_a), prior_key(prior_b), int(horizon), float(switching_cost)))
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+def _artifact_paths(key, directory):
+    directory = directory or ARTIFACT_DIR
+    return os.path.join(directory, f'{key}.q.npy'), os.path.join(directory, f'{key}.json')
+
+def save_policy(policy, directory=None):
+    """Writes a PolicyTable to the artifact store and returns the path of its .npy file."""
+    key = artifact_key(policy.prior_a, policy.prior_b, policy.horizon, policy.switching_cost)
+    q_path, meta_path = _artifact_paths(key, directory)
+    os.makedirs(os.path.dirname(q_path), exist_ok=True)
+    meta = {
+        'version': ARTIFACT_VERSION,
+        # [acc, prob] pairs in the prior's own order, so a loaded table has the same priors as a solved one
+        'prior_a': [[float(acc), float(prob)] for acc, prob in policy.prior_a.items()],
+        'prior_b': [[float(acc), float(prob)] for acc, prob in policy.prior_b.items()],
+        'horizon': policy.horizon,
+        'switching_cost': policy.switching_cost,
+    }
+    # Write to temporary names and rename, so a concurrent reader never sees a partial file
+    tmp_q, tmp_meta = f'{q_path}.{os.getpid()}.tmp', f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp_q, 'wb') as f:
+        np.save(f, np.ascontiguousarray(policy.q))
+    with open(tmp_meta, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_q, q_path)
+    os.replace(tmp_meta, meta_path)
+    return q_path
+
+def load_policy(prior_a, prior_b, horizon, switching_cost=0.0, directory=None):
+    """Memory-maps a stored PolicyTable, or returns None if it has not been solved yet."""
+    key = artifact_key(prior_a, prior_b, horizon, switching_cost)
+    q_path, meta_path = _artifact_paths(key, directory)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        q = np.load(q_path, mmap_mode='r')
+    except FileNotFoundError:
+        return None
+    if meta.get('version') != ARTIFACT_VERSION:
+        return None
+    return PolicyTable(q, dict(meta['prior_a']), dict(meta['prior_b']), meta['horizon'], meta['switching_cost'])
+
+def get_policy(prior_a, prior_b, horizon=HORIZON, switching_cost=0.0, directory=None):
+    """Stored PolicyTable for this game, solving and saving it first if needed."""
+    policy = load_policy(prior_a, prior_b, horizon, switching_cost, directory)
+    if policy is None:
+        save_policy(solve_dp(prior_a, prior_b, horizon, switching_cost), directory)
+        policy = load_policy(prior_a, prior_b, horizon, switching_cost, directory)
+    return policy
+
 # --- 2. GENERATE DATA FOR PLOTS ---
 
-def generate_heatmap_data():
+def generate_heatmap_data(policy):
     print("Generating Heatmap Data (Patience Frontier)...")
     # We look at the decision boundary assuming B is still "Fresh" (0 wins, 0 losses)
     grid_size = 14
-    diff_grid = np.zeros((grid_size, grid_size))
-    
-    for w in range(grid_size):
-        for l in range(grid_size):
-            if w + l >= HORIZON:
-                diff_grid[l, w] = np.nan # Impossible state
-                continue
-            
-            # Reconstruct A's prior for this specific grid cell
-            curr_pA = PRIOR_A.copy()
-            for _ in range(w): curr_pA = update_prior(curr_pA, True)
-            for _ in range(l): curr_pA = update_prior(curr_pA, False)
-            
-            # Get Q-values assuming B is fresh (0,0)
-            qA, qB = solve_dp(w, l, 0, 0, curr_pA, PRIOR_B)
-            
-            # Store difference: Positive = Stay A, Negative = Switch B
-            diff_grid[l, w] = qA - qB
-            
+    losses, wins = np.indices((grid_size, grid_size))
+    diff_grid = np.full((grid_size, grid_size), np.nan)  # NaN = impossible state
+
+    valid = wins + losses < policy.horizon
+    # So far only A was consulted, so with a switching cost moving to B is a switch
+    qA, qB = policy.q_values(wins[valid], losses[valid], 0, 0, last=0)
+    # Store difference: Positive = Stay A, Negative = Switch B
+    diff_grid[valid] = qA - qB
     return diff_grid
 
-def run_simulation():
-    print(f"Running Monte Carlo Simulation ({SIMULATION_RUNS} runs)...")
-    scores = []
-    
-    for _ in range(SIMULATION_RUNS):
-        # 1. Determine True Accuracies for this specific world
-        true_A = np.random.choice(list(PRIOR_A.keys()), p=list(PRIOR_A.values()))
-        true_B = np.random.choice(list(PRIOR_B.keys()), p=list(PRIOR_B.values()))
-        
-        # 2. Play the game
-        sA, fA, sB, fB = 0, 0, 0, 0
-        pA, pB = PRIOR_A.copy(), PRIOR_B.copy()
-        score = 0
-        
-        for _ in range(HORIZON):
-            qA, qB = solve_dp(sA, fA, sB, fB, pA, pB)
-            
-            # Greedy choice on Q-values
-            choice = 'A' if qA >= qB else 'B'
-            
-            if choice == 'A':
-                is_correct = np.random.rand() < true_A
-                if is_correct:
-                    score += 1
-                    sA += 1
-                    pA = update_prior(pA, True)
-                else:
-                    fA += 1
-                    pA = update_prior(pA, False)
+def patience_frontiers(prior_a=PRIOR_A, prior_b=PRIOR_B, horizon=HORIZON, switching_cost=SWITCHING_COST):
+    """Heatmap data for both treatment arms: (no switching cost, with switching cost)."""
+    return (generate_heatmap_data(get_policy(prior_a, prior_b, horizon)),
+            generate_heatmap_data(get_policy(prior_a, prior_b, horizon, switching_cost)))
+
+SimulationResult = namedtuple('SimulationResult', ['scores', 'choices_A', 'choices_B', 'switches'])
+
+def draw_accuracies(prior, size, rng):
+    """
+    True accuracies for `size` simulated worlds, drawn from a discrete prior. Levels are taken in
+    sorted order, so the draws depend only on the prior's contents, not on how its dict was built
+    (a table from the DPSolver cache or the artifact store may list the levels in another order).
+    """
+    levels = sorted(prior)
+    return rng.choice(levels, size=size, p=[prior[acc] for acc in levels])
+
+def simulate_batch(policy, n_runs, seed=None, chunk_size=100_000):
+    """
+    Plays `n_runs` games under a solved PolicyTable, advancing every run together one round per step.
+    Each run draws its true accuracies up front plus an outcome tape per advisor (the k-th consult of A
+    is correct with tape_A[k]), so memory stays bounded by `chunk_size` runs at a time.
+    `seed` may be an int, a SeedSequence or a numpy Generator.
+    Returns a SimulationResult of per-run arrays: scores, choices of A and B, and number of switches
+    (the net payoff under a switching cost is scores - policy.switching_cost * switches).
+    """
+    rng = np.random.default_rng(seed)
+    horizon = policy.horizon
+    choose_B_table = policy.policy.astype(bool)
+    if choose_B_table.ndim == 1:
+        choose_B_table = np.stack([choose_B_table, choose_B_table], axis=1)
+    parts = []
+
+    for start in range(0, n_runs, chunk_size):
+        n = min(chunk_size, n_runs - start)
+        runs = np.arange(n)
+        tape_A = rng.random((horizon, n)) < draw_accuracies(policy.prior_a, n, rng)
+        tape_B = rng.random((horizon, n)) < draw_accuracies(policy.prior_b, n, rng)
+
+        sA, fA, sB, fB = (np.zeros(n, dtype=np.int64) for _ in range(4))
+        switches = np.zeros(n, dtype=np.int64)
+        last_B = np.zeros(n, dtype=bool)
+        for t in range(horizon):
+            choose_B = choose_B_table[state_index(sA, fA, sB, fB), last_B.astype(np.int64)]
+            is_correct = np.where(choose_B, tape_B[sB + fB, runs], tape_A[sA + fA, runs])
+            sA += ~choose_B & is_correct
+            fA += ~choose_B & ~is_correct
+            sB += choose_B & is_correct
+            fB += choose_B & ~is_correct
+            if t > 0:
+                switches += choose_B != last_B
+            last_B = choose_B
+        parts.append((sA + sB, sA + fA, sB + fB, switches))
+
+    return SimulationResult(*(np.concatenate(column) for column in zip(*parts)))
+
+def run_simulation(policy, n_runs=SIMULATION_RUNS, seed=None):
+    print(f"Running Monte Carlo Simulation ({n_runs} runs)...")
+    return simulate_batch(policy, n_runs, seed).scores
+
+# --- 2b. PARALLEL RUNNER ---
+
+# Policy table of the current worker process, opened once by _init_worker
+_worker_policy = None
+
+def _init_worker(q_path, prior_a, prior_b, horizon, switching_cost):
+    global _worker_policy
+    # Memory-mapped read-only: every worker shares the same pages instead of re-solving
+    _worker_policy = PolicyTable(np.load(q_path, mmap_mode='r'), prior_a, prior_b, horizon, switching_cost)
+
+def _simulate_chunk(chunk, seed_seq, n_runs):
+    return chunk, simulate_batch(_worker_policy, n_runs, seed_seq)
+
+def run_parallel_simulation(policy, n_runs=SIMULATION_RUNS, seed=None, workers=None,
+                            chunk_size=50_000, verbose=True):
+    """
+    simulate_batch split across a process pool. Runs are cut into fixed-size chunks and chunk i always
+    uses the i-th stream of SeedSequence(seed).spawn, so results are bit-identical for any worker count.
+    Chunks are merged into the output arrays as they complete. workers=1 runs in-process.
+    Returns (SimulationResult, runs per second).
+    """
+    n_chunks = -(-n_runs // chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    sizes = [min(chunk_size, n_runs - i * chunk_size) for i in range(n_chunks)]
+    merged = SimulationResult(*(np.empty(n_runs, dtype=np.int64) for _ in SimulationResult._fields))
+
+    def merge(chunk, result):
+        lo = chunk * chunk_size
+        for out, part in zip(merged, result):
+            out[lo:lo + len(part)] = part
+
+    started = time.perf_counter()
+    if workers == 1:
+        for i in range(n_chunks):
+            merge(i, simulate_batch(policy, sizes[i], seeds[i]))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            if isinstance(policy.q, np.memmap):
+                q_path = policy.q.filename  # Already in the artifact store
             else:
-                is_correct = np.random.rand() < true_B
-                if is_correct:
-                    score += 1
-                    sB += 1
-                    pB = update_prior(pB, True)
-                else:
-                    fB += 1
-                    pB = update_prior(pB, False)
-        scores.append(score)
-    return scores
+                q_path = os.path.join(tmp, 'q.npy')
+                np.save(q_path, policy.q)
+            initargs = (q_path, policy.prior_a, policy.prior_b, policy.horizon, policy.switching_cost)
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+                futures = [pool.submit(_simulate_chunk, i, seeds[i], sizes[i]) for i in range(n_chunks)]
+                for future in as_completed(futures):
+                    merge(*future.result())
+    rate = n_runs / (time.perf_counter() - started)
+
+    if verbose:
+        print(f"Simulated {n_runs} runs at {rate:,.0f} runs/s")
+    return merged, rate
+
+# --- 2c. EXACT SCORE DISTRIBUTION ---
+
+ScoreDistribution = namedtuple('ScoreDistribution', ['probabilities', 'mean', 'variance', 'expected_switches'])
+
+def score_distribution(policy, prior_a=None, prior_b=None, horizon=None):
+    """
+    Exact distribution of total correct answers, by pushing probability mass forward through the
+    state lattice separately for every pair of true accuracies (no Monte Carlo noise).
+    `policy` is a PolicyTable, or any action table (0 = A, 1 = B per state, optionally per last
+    choice as in PolicyTable.policy) together with the priors and horizon it is played under.
+    probabilities[k] = P(k correct answers), k = 0..horizon.
+    """
+    if isinstance(policy, PolicyTable):
+        prior_a, prior_b, horizon = policy.prior_a, policy.prior_b, policy.horizon
+        policy = policy.policy
+    pick_B = np.asarray(policy) == 1
+    if pick_B.ndim == 1:
+        pick_B = np.stack([pick_B, pick_B], axis=1)
+
+    # One column per (true_A, true_B) pair, weighted by its prior probability
+    true_A, true_B = (a.ravel() for a in np.meshgrid(list(prior_a), list(prior_b), indexing='ij'))
+    weight = np.outer(list(prior_a.values()), list(prior_b.values())).ravel()
+
+    # mass[state, last, pair]; the first trial reads the last = A row, which equals the B row for solved tables
+    mass = np.zeros((1, 2, len(weight)))
+    mass[0, 0] = weight
+    expected_switches = 0.0
+    for t in range(horizon):
+        sA, fA, sB, fB = layer_states(t)
+        choose_B = pick_B[num_states(t):num_states(t + 1)]
+        nxt = np.zeros((_layer_size(t + 1), 2, len(weight)))
+        for last in (0, 1):
+            to_B = choose_B[:, last, None]
+            mass_A = np.where(to_B, 0.0, mass[:, last])
+            mass_B = np.where(to_B, mass[:, last], 0.0)
+            if t > 0:
+                expected_switches += (mass_B if last == 0 else mass_A).sum()
+            # Each successor map is one-to-one within a layer, so += with fancy indexing is safe
+            nxt[_local_index(t + 1, sA + 1, fA, sB), 0] += mass_A * true_A
+            nxt[_local_index(t + 1, sA, fA + 1, sB), 0] += mass_A * (1 - true_A)
+            nxt[_local_index(t + 1, sA, fA, sB + 1), 1] += mass_B * true_B
+            nxt[_local_index(t + 1, sA, fA, sB), 1] += mass_B * (1 - true_B)
+        mass = nxt
+
+    sA, fA, sB, fB = layer_states(horizon)
+    probabilities = np.bincount(sA + sB, weights=mass.sum(axis=(1, 2)), minlength=horizon + 1)
+    scores = np.arange(horizon + 1)
+    mean = float(probabilities @ scores)
+    variance = float(probabilities @ (scores - mean) ** 2)
+    return ScoreDistribution(probabilities, mean, variance, float(expected_switches))
 
 # --- 3. PLOTTING FUNCTION ---
 
-def create_thesis_plots(diff_grid, scores):
-    print("Generating Plots...")
-    sns.set_context("paper", font_scale=1.5)
-    sns.set_style("whitegrid")
-    
-    # --- FIGURE 1: HEATMAP ---
-    fig1, ax1 = plt.subplots(figsize=(8, 6))
+def _plotting():
+    import matplotlib.pyplot as plt  # type: ignore[import-untyped]
+    import seaborn as sns  # type: ignore[import-untyped]
+    return plt, sns
+
+def _plot_frontier(diff_grid, title, filename, annotate=True):
+    plt, sns = _plotting()
+    fig, ax = plt.subplots(figsize=(8, 6))
     
     # Custom Colormap: Red (Switch) to Blue (Stay)
     # Using a diverging palette centered at 0
     cmap = sns.diverging_palette(10, 240, as_cmap=True, center="light")
     
-    sns.heatmap(diff_grid, ax=ax1, cmap=cmap, center=0, 
+    sns.heatmap(diff_grid, ax=ax, cmap=cmap, center=0, 
                 annot=True, fmt=".1f", annot_kws={"size": 7},
                 cbar_kws={'label': 'Expected Advantage of A vs B'},
                 square=True, mask=np.isnan(diff_grid))
     
-    ax1.set_title("Optimal 'Patience Frontier' (Start of Block)", fontweight='bold')
-    ax1.set_xlabel("Wins by Advisor A")
-    ax1.set_ylabel("Losses by Advisor A")
-    ax1.invert_yaxis() # Put 0 losses at bottom
+    ax.set_title(title, fontweight='bold')
+    ax.set_xlabel("Wins by Advisor A")
+    ax.set_ylabel("Losses by Advisor A")
+    ax.invert_yaxis() # Put 0 losses at bottom
     
     # Add Text Annotations for clarity
-    ax1.text(0.5, 0.5, "START", color='black', ha='center', va='center', weight='bold', fontsize=10)
-    ax1.text(0.5, 1.5, "SWITCH", color='darkred', ha='center', va='center', weight='bold', fontsize=9)
+    if annotate:
+        ax.text(0.5, 0.5, "START", color='black', ha='center', va='center', weight='bold', fontsize=10)
+        ax.text(0.5, 1.5, "SWITCH", color='darkred', ha='center', va='center', weight='bold', fontsize=9)
     
     plt.tight_layout()
-    plt.savefig("Figure1_PatienceFrontier.png", dpi=300)
-    print("Saved Figure1_PatienceFrontier.png")
-    
-    # --- FIGURE 2: HISTOGRAM ---
-    fig2, ax2 = plt.subplots(figsize=(8, 6))
-    
-    mean_score = np.mean(scores)
-    sns.histplot(scores, bins=np.arange(4.5, 21.5, 1), kde=False, color="#2c7fb8", alpha=0.8, stat='percent')
+    plt.savefig(filename, dpi=300)
+    plt.close(fig)
+    print(f"Saved {filename}")
+
+def create_thesis_plots(diff_grid, scores, cost_grid=None, out_dir='.', figures=(1, 2, 3), horizon=HORIZON):
+    print("Generating Plots...")
+    plt, sns = _plotting()
+    sns.set_context("paper", font_scale=1.5)
+    sns.set_style("whitegrid")
     
-    # Add Mean Line
-    ax2.axvline(mean_score, color='red', linestyle='--', linewidth=2, label=f'Mean Score: {mean_score:.2f}')
+    # --- FIGURE 1: HEATMAP ---
+    if 1 in figures:
+        _plot_frontier(diff_grid, "Optimal 'Patience Frontier' (Start of Block)",
+                       os.path.join(out_dir, "Figure1_PatienceFrontier.png"))
     
-    ax2.set_title(f"Performance Distribution (Optimal Agent)", fontweight='bold')
-    ax2.set_xlabel("Total Correct Answers (out of 20)")
-    ax2.set_ylabel("Frequency (%)")
-    ax2.set_xticks(range(5, 21))
-    ax2.legend()
+    # --- FIGURE 2: HISTOGRAM ---
+    if 2 in figures:
+        fig2, ax2 = plt.subplots(figsize=(8, 6))
+        if isinstance(scores, ScoreDistribution):
+            horizon = len(scores.probabilities) - 1
+        low = horizon // 4  # Scores below a quarter correct are too rare to show (5 of 20)
+        
+        if isinstance(scores, ScoreDistribution):
+            # Exact distribution: bars at each score, same look as the Monte Carlo histogram
+            mean_score = scores.mean
+            ax2.bar(np.arange(len(scores.probabilities)), 100 * scores.probabilities, width=1.0,
+                    color="#2c7fb8", alpha=0.8, edgecolor='black', linewidth=0.5)
+            ax2.set_xlim(low - 0.5, horizon + 0.5)
+        else:
+            mean_score = np.mean(scores)
+            sns.histplot(scores, bins=np.arange(low - 0.5, horizon + 1.5, 1), kde=False, color="#2c7fb8", alpha=0.8, stat='percent')
+        
+        # Add Mean Line
+        ax2.axvline(mean_score, color='red', linestyle='--', linewidth=2, label=f'Mean Score: {mean_score:.2f}')
+        
+        ax2.set_title(f"Performance Distribution (Optimal Agent)", fontweight='bold')
+        ax2.set_xlabel(f"Total Correct Answers (out of {horizon})")
+        ax2.set_ylabel("Frequency (%)")
+        ax2.set_xticks(range(low, horizon + 1, max(1, horizon // 20)))
+        ax2.legend()
+        
+        plt.tight_layout()
+        filename = os.path.join(out_dir, "Figure2_ScoreDistribution.png")
+        plt.savefig(filename, dpi=300)
+        plt.close(fig2)
+        print(f"Saved {filename}")
     
-    plt.tight_layout()
-    plt.savefig("Figure2_ScoreDistribution.png", dpi=300)
-    print("Saved Figure2_ScoreDistribution.png")
+    # --- FIGURE 3: HEATMAP, SWITCHING-COST TREATMENT ---
+    if 3 in figures and cost_grid is not None:
+        _plot_frontier(cost_grid, "Patience Frontier with Switching Cost",
+                       os.path.join(out_dir, "Figure3_SwitchingCostFrontier.png"), annotate=False)
+
+# --- 4. COMMAND LINE & CACHED OUTPUTS ---
+# Each step caches its output next to the policy artifacts, so re-rendering a figure after a styling
+# tweak only reads a few small .npz files:
+#   python Gittins.py solve | heatmap | simulate [--runs N --seed S] | plot [--monte-carlo]
+#   python Gittins.py        (all steps, as before)
+
+def _cached(name, compute, refresh=False):
+    path = os.path.join(ARTIFACT_DIR, f'{name}.npz')
+    if not refresh and os.path.exists(path):
+        with np.load(path) as data:
+            return {key: data[key] for key in data.files}
+    data = compute()
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **data)
+    os.replace(tmp, path)
+    return data
+
+def cached_heatmaps(prior_a=PRIOR_A, prior_b=PRIOR_B, horizon=HORIZON, switching_cost=SWITCHING_COST, refresh=False):
+    """patience_frontiers output as {'no_cost': grid, 'switching_cost': grid}, computed once."""
+    def compute():
+        no_cost, with_cost = patience_frontiers(prior_a, prior_b, horizon, switching_cost)
+        return {'no_cost': no_cost, 'switching_cost': with_cost}
+    return _cached(f"heatmap-{artifact_key(prior_a, prior_b, horizon, switching_cost)}", compute, refresh)
+
+def cached_distribution(prior_a=PRIOR_A, prior_b=PRIOR_B, horizon=HORIZON, refresh=False):
+    """score_distribution of the stored optimal policy, computed once."""
+    def compute():
+        return score_distribution(get_policy(prior_a, prior_b, horizon))._asdict()
+    data = _cached(f"distribution-{artifact_key(prior_a, prior_b, horizon)}", compute, refresh)
+    return ScoreDistribution(data['probabilities'], float(data['mean']), float(data['variance']),
+                             float(data['expected_switches']))
+
+def cached_simulation(prior_a=PRIOR_A, prior_b=PRIOR_B, horizon=HORIZON, n_runs=SIMULATION_RUNS, seed=0,
+                      workers=None, refresh=False):
+    """run_parallel_simulation of the stored optimal policy as a dict of SimulationResult arrays, computed once."""
+    def compute():
+        result, _ = run_parallel_simulation(get_policy(prior_a, prior_b, horizon), n_runs, seed, workers)
+        return result._asdict()
+    return _cached(f"simulation-{artifact_key(prior_a, prior_b, horizon)}-{n_runs}-{seed}", compute, refresh)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimal advisor-choice benchmark and thesis figures.")
+    parser.add_argument('--horizon', type=int, default=HORIZON)
+    parser.add_argument('--switching-cost', type=float, default=SWITCHING_COST,
+                        help="switching cost of the cost treatment, in correct answers (default: %(default)s)")
+    parser.add_argument('--refresh', action='store_true', help="recompute instead of reading cached outputs")
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('solve', help="solve and store the policy tables of both treatment arms")
+    commands.add_parser('heatmap', help="patience frontiers of both treatment arms")
+    simulate = commands.add_parser('simulate', help="Monte Carlo simulation of the optimal agent")
+    plot = commands.add_parser('plot', help="render the figures from cached outputs")
+    for command in (simulate, plot):
+        command.add_argument('--runs', type=int, default=SIMULATION_RUNS)
+        command.add_argument('--seed', type=int, default=0)
+        command.add_argument('--workers', type=int, default=None)
+    plot.add_argument('--monte-carlo', action='store_true', help="Figure 2 from the simulation instead of the exact distribution")
+    plot.add_argument('--figures', type=int, nargs='+', default=[1, 2, 3])
+    plot.add_argument('--out-dir', default='.')
+    args = parser.parse_args(argv)
+
+    if args.command == 'solve':
+        for cost in (0.0, args.switching_cost):
+            policy = get_policy(PRIOR_A, PRIOR_B, args.horizon, cost)
+            print(f"Switching cost {cost}: optimal value {policy.value:.4f} ({policy.q.filename})")
+    elif args.command == 'heatmap':
+        cached_heatmaps(PRIOR_A, PRIOR_B, args.horizon, args.switching_cost, args.refresh)
+        print("Patience frontiers ready")
+    elif args.command == 'simulate':
+        scores = cached_simulation(PRIOR_A, PRIOR_B, args.horizon, args.runs, args.seed, args.workers,
+                                   args.refresh)['scores']
+        half_width = 1.96 * scores.std() / np.sqrt(len(scores))
+        print(f"Mean score {scores.mean():.4f} ± {half_width:.4f} over {len(scores)} runs")
+    else:
+        heatmaps = cached_heatmaps(PRIOR_A, PRIOR_B, args.horizon, args.switching_cost, args.refresh)
+        if getattr(args, 'monte_carlo', False):
+            scores = cached_simulation(PRIOR_A, PRIOR_B, args.horizon, args.runs, args.seed, args.workers,
+                                       args.refresh)['scores']
+        else:
+            scores = cached_distribution(PRIOR_A, PRIOR_B, args.horizon, args.refresh)
+        create_thesis_plots(heatmaps['no_cost'], scores, heatmaps['switching_cost'],
+                            out_dir=getattr(args, 'out_dir', '.'), figures=getattr(args, 'figures', (1, 2, 3)),
+                            horizon=args.horizon)
 
 if __name__ == "__main__":
     # Run from the same environment where matplotlib/seaborn are installed, e.g.:
     #   cd advisor_study_project/advisor_experiment && python Gittins.py
     # If you get ModuleNotFoundError for matplotlib/seaborn, install for that Python:
     #   python -m pip install matplotlib seaborn numpy
-    # 1. Populate Memoization Table (by running start state)
-    print("Solving DP...")
-    solve_dp(0, 0, 0, 0, PRIOR_A.copy(), PRIOR_B.copy())
-    
-    # 2. Get Data
-    heatmap_data = generate_heatmap_data()
-    simulation_scores = run_simulation()
-    
-    # 3. Plot (skipped if matplotlib/seaborn not installed)
-    create_thesis_plots(heatmap_data, simulation_scores)
+    # Only the plot step needs them; solve / heatmap / simulate run with numpy alone.
+    main()
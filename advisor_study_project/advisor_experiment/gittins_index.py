@@ -0,0 +1,151 @@
+import numpy as np
+
+try:
+    from . import Gittins
+except ImportError:  # Run as a script from this folder
+    import Gittins
+
+# --- Per-advisor Gittins indices by calibration ---
+# Each advisor is calibrated on its own against a "retirement" option paying a known reward lam
+# per round: the index of state (s, f) is the lam at which consulting the advisor and retiring
+# are equally good. Every arm has an O(H^2) table over (s, f), so K advisors cost K tables
+# instead of the joint DP's O(H^(2K)) state space.
+#
+# The calibration subproblems of all states are solved together: one bisection step is one
+# backward sweep over arrays shaped (failures so far, state being calibrated).
+
+def _continuation_gap(lam, s0, f0, depth, means, discount):
+    """
+    Value of consulting once more minus the value of retiring now, for every root (s0, f0)
+    at its own retirement reward lam. depth = rounds left (finite horizon, discount == 1)
+    or lookahead truncation (discount < 1).
+    """
+    if discount < 1:
+        # Beyond the lookahead, assume the better of retiring and keeping the current advisor forever
+        j = np.arange(depth + 1)[:, None]
+        v = np.maximum(lam, means[s0 + depth - j, f0 + j]) / (1 - discount)
+    else:
+        v = np.zeros((depth + 1, len(s0)))
+
+    for k in range(depth - 1, -1, -1):
+        j = np.arange(k + 1)[:, None]  # failures among the k consults since the root
+        exp_acc = means[s0 + k - j, f0 + j]
+        cont = exp_acc * (1 + discount * v[:-1]) + (1 - exp_acc) * discount * v[1:]
+        retire = lam / (1 - discount) if discount < 1 else lam * (depth - k)
+        if k == 0:
+            return cont[0] - retire
+        v = np.maximum(retire, cont)
+
+def _calibrate(prior, s0, f0, depth, discount, tol):
+    """Bisection on the retirement reward, vectorized over all roots."""
+    means = Gittins.solver.posterior_means(prior, int(max(s0.max(), f0.max())) + depth)
+    lo = np.full(len(s0), min(prior))
+    hi = np.full(len(s0), max(prior))
+    for _ in range(int(np.ceil(np.log2((max(prior) - min(prior)) / tol)))):
+        lam = (lo + hi) / 2
+        keep_going = _continuation_gap(lam, s0, f0, depth, means, discount) > 0
+        lo = np.where(keep_going, lam, lo)
+        hi = np.where(keep_going, hi, lam)
+    return (lo + hi) / 2
+
+def finite_horizon_index(prior, horizon=Gittins.HORIZON, tol=1e-9):
+    """
+    Finite-horizon index table index[s, f, r]: the calibrated per-round reward of an advisor seen
+    at (s, f) with r rounds left in the block. NaN where s + f + r > horizon.
+    """
+    index = np.full((horizon + 1, horizon + 1, horizon + 1), np.nan)
+    for r in range(1, horizon + 1):
+        s0, f0 = np.indices((horizon - r + 1, horizon - r + 1)).reshape(2, -1)
+        keep = s0 + f0 <= horizon - r
+        s0, f0 = s0[keep], f0[keep]
+        index[s0, f0, r] = _calibrate(prior, s0, f0, r, 1.0, tol)
+    return index
+
+# Default cap on the discounted calibration's lookahead. Past it the tail is valued as
+# max(lam, mean) / (1 - discount), and by then the posterior has barely any information left to
+# gain: at discount 0.99 the index moves by about 6e-6 between lookahead 200 and the untruncated 917.
+MAX_LOOKAHEAD = 200
+
+def discounted_index(prior, max_count=Gittins.HORIZON, discount=0.9, lookahead=None, tol=1e-9,
+                     truncation=1e-4, max_lookahead=MAX_LOOKAHEAD):
+    """
+    Classic discounted Gittins index table index[s, f] for s + f <= max_count.
+    The calibration is truncated `lookahead` consults past each state; by default until
+    discount^k < truncation, capped at max_lookahead. NaN where s + f > max_count.
+    Cost is about roots * lookahead^2 / 2 * log2(0.6 / tol) updates, roots = (max_count + 1)(max_count + 2) / 2:
+    a few seconds at discount 0.99 and max_count 20, about 20 s at max_count 60.
+    """
+    if lookahead is None:
+        lookahead = min(int(np.ceil(np.log(truncation) / np.log(discount))), max_lookahead)
+    s0, f0 = np.indices((max_count + 1, max_count + 1)).reshape(2, -1)
+    keep = s0 + f0 <= max_count
+    index = np.full((max_count + 1, max_count + 1), np.nan)
+    index[s0[keep], f0[keep]] = _calibrate(prior, s0[keep], f0[keep], lookahead, discount, tol)
+    return index
+
+# --- Index policies ---
+
+def index_policy_actions(prior_a, prior_b, horizon=Gittins.HORIZON, discount=None):
+    """
+    Two-advisor index policy on the joint DP lattice (0 = A, 1 = B per state, ties to A), so it can be
+    scored exactly with Gittins.evaluate_policy. discount=None uses the finite-horizon index with the
+    block's remaining rounds; otherwise the discounted index.
+    """
+    actions = np.empty(Gittins.num_states(horizon), dtype=np.int8)
+    if discount is None:
+        index_A = finite_horizon_index(prior_a, horizon)
+        index_B = finite_horizon_index(prior_b, horizon)
+    else:
+        index_A = discounted_index(prior_a, horizon, discount)[..., None]
+        index_B = discounted_index(prior_b, horizon, discount)[..., None]
+    for t in range(horizon):
+        sA, fA, sB, fB = Gittins.layer_states(t)
+        r = horizon - t if discount is None else 0
+        actions[Gittins.num_states(t):Gittins.num_states(t + 1)] = index_B[sB, fB, r] > index_A[sA, fA, r]
+    return actions
+
+def compare_with_dp(prior_a=Gittins.PRIOR_A, prior_b=Gittins.PRIOR_B, horizon=Gittins.HORIZON, discount=0.9):
+    """Expected correct answers of the exact DP and of both index policies, all computed exactly."""
+    optimal = Gittins.solve_dp(prior_a, prior_b, horizon).value
+    finite = Gittins.evaluate_policy(index_policy_actions(prior_a, prior_b, horizon), prior_a, prior_b, horizon)
+    discounted = Gittins.evaluate_policy(
+        index_policy_actions(prior_a, prior_b, horizon, discount), prior_a, prior_b, horizon)
+    return {
+        'optimal': optimal,
+        'finite_horizon_index': finite,
+        'discounted_index': discounted,
+        'finite_horizon_regret': optimal - finite,
+        'discounted_regret': optimal - discounted,
+    }
+
+def simulate_index_policy(priors, horizon=Gittins.HORIZON, n_runs=Gittins.SIMULATION_RUNS, seed=None,
+                          chunk_size=100_000):
+    """
+    Monte Carlo score of the finite-horizon index policy with any number of advisors, one prior each
+    (e.g. the six advisors A-F). Returns (scores, choice counts of shape (K, n_runs)).
+    """
+    rng = np.random.default_rng(seed)
+    tables = [finite_horizon_index(prior, horizon) for prior in priors]
+    scores, choices = [], []
+
+    for start in range(0, n_runs, chunk_size):
+        n = min(chunk_size, n_runs - start)
+        runs = np.arange(n)
+        tapes = np.stack([rng.random((horizon, n)) < Gittins.draw_accuracies(prior, n, rng) for prior in priors])
+        succ = np.zeros((len(priors), n), dtype=np.int64)
+        fail = np.zeros((len(priors), n), dtype=np.int64)
+        for t in range(horizon):
+            index = np.stack([table[s, f, horizon - t] for table, s, f in zip(tables, succ, fail)])
+            pick = index.argmax(axis=0)
+            is_correct = tapes[pick, succ[pick, runs] + fail[pick, runs], runs]
+            succ[pick, runs] += is_correct
+            fail[pick, runs] += ~is_correct
+        scores.append(succ.sum(axis=0))
+        choices.append(succ + fail)
+
+    return np.concatenate(scores), np.concatenate(choices, axis=1)
+
+if __name__ == "__main__":
+    print("Finite-horizon and discounted index policies vs the exact DP:")
+    for name, value in compare_with_dp().items():
+        print(f"  {name}: {value:.4f}")
@@ -3,11 +3,18 @@ from otree.api import (  # type: ignore[import-untyped]
     BaseSubsession,
     BaseGroup,
     BasePlayer,
+    ExtraModel,
     cu,
     models,
     widgets,
 )
-import random
+import base64
+import itertools
+import json
+import time
+import numpy as np
+
+from . import Gittins
 
 doc = """
 Advisor Study: Active vs Passive Sampling.
@@ -34,106 +41,141 @@ class Constants(BaseConstants):
     grid_height = 10
     total_pixels = 200
     majority_threshold = 0.55 # 55% majority
+    image_seconds = 5  # How long the image is shown (ViewImage timeout, image step of the live Trial)
+
+# Advisor accuracy: A, C, E use dominant probs (30,30,20,20); B, D, F use inverse (20,20,30,30)
+ADVISORS = 'ABCDEF'
+ACCURACY_LEVELS = [0.80, 0.60, 0.40, 0.20]
+PROBS_DOMINANT = [0.30, 0.30, 0.20, 0.20]   # A, C, E: 80/60/40/20 with 30%, 30%, 20%, 20%
+PROBS_INVERSE = [0.20, 0.20, 0.30, 0.30]    # B, D, F: 80/60/40/20 with 20%, 20%, 30%, 30%
+# Male European-sounding names; A,C,E = Dots & Co., B,D,F = PixelHouse
+NAMES_DOTS = ['Josh', 'Thomas', 'Lukas', 'Henrik', 'Stefan', 'Marc']
+NAMES_PIXEL = ['Marcus', 'Niklas', 'Felix', 'Erik', 'Jonas', 'Paul']
+
+# Bit flags of one trial in the schedule (one uint8 per participant and round)
+TRUE_RED = 1
+HIGH_CORRECT = 2
+LOW_CORRECT = 4
+PASSIVE_HIGH = 8  # Advisor shown if the round is in a Passive block
+
+# --- Optimal-advisor benchmark (see Player.record_benchmark) ---
+# The block game of Gittins.py with this app's priors and block length: High = advisor A of the DP.
+# Tables come from the artifact store (solved and saved on first use) and are kept per process.
+_policies = {}
+
+def advisor_policy(has_switching_cost):
+    """Gittins.PolicyTable for a participant's treatment, loaded once per server process."""
+    switching_cost = Gittins.SWITCHING_COST if has_switching_cost else 0.0
+    policy = _policies.get(switching_cost)
+    if policy is None:
+        policy = Gittins.get_policy(dict(zip(ACCURACY_LEVELS, PROBS_DOMINANT)),
+                                    dict(zip(ACCURACY_LEVELS, PROBS_INVERSE)),
+                                    ROUNDS_PER_BLOCK, switching_cost)
+        _policies[switching_cost] = policy
+    return policy
+
+def build_schedule(rng, num_players, num_rounds=Constants.num_rounds):
+    """
+    Every random draw of a session in one pass. Row i belongs to the player with id_in_subsession i + 1.
+    flags[i, r] packs the truth, both advisors' correctness and the Passive pick of round r + 1.
+    """
+    accuracy = np.empty((num_players, len(ADVISORS)))
+    accuracy[:, 0::2] = rng.choice(ACCURACY_LEVELS, size=(num_players, 3), p=PROBS_DOMINANT)
+    accuracy[:, 1::2] = rng.choice(ACCURACY_LEVELS, size=(num_players, 3), p=PROBS_INVERSE)
+    block = np.minimum(np.arange(num_rounds) // ROUNDS_PER_BLOCK, 2)
+    draws = rng.random((4, num_players, num_rounds))
+    flags = (TRUE_RED * (draws[0] < 0.5)
+             | HIGH_CORRECT * (draws[1] < accuracy[:, 0::2][:, block])
+             | LOW_CORRECT * (draws[2] < accuracy[:, 1::2][:, block])
+             | PASSIVE_HIGH * (draws[3] < 0.5)).astype(np.uint8)
+
+    # 3 distinct names per company so the same name never appears in two blocks
+    dots = np.argsort(rng.random((num_players, len(NAMES_DOTS))), axis=1)[:, :3]
+    pixel = np.argsort(rng.random((num_players, len(NAMES_PIXEL))), axis=1)[:, :3]
+    names = [[name for d, x in zip(dots_row, pixel_row)
+              for name in (f"{NAMES_DOTS[d]} (Dots & Co.)", f"{NAMES_PIXEL[x]} (PixelHouse)")]
+             for dots_row, pixel_row in zip(dots.tolist(), pixel.tolist())]
+
+    # Even IDs: Active first in block 1; Odd: Passive first. Block 3 is always Active.
+    block_order = [['Active', 'Passive', 'Active'] if (i + 1) % 2 == 0 else ['Passive', 'Active', 'Active']
+                   for i in range(num_players)]
+    return {
+        'accuracy': accuracy.tolist(),
+        'names': names,
+        'block_order': block_order,
+        # Half of participants have 5¢ switching cost when changing advisor in Active block
+        'has_switching_cost': (rng.random(num_players) < 0.5).tolist(),
+        'flags': flags,
+    }
+
+def build_stimuli(rng, true_red, width=Constants.grid_width, height=Constants.grid_height,
+                  majority_threshold=Constants.majority_threshold):
+    """
+    One image per player: a random majority_threshold share of the width x height pixels in the true
+    color. Each is stored as base64 of the packed pixel bits (1 = red, row-major; 200 pixels = 25 bytes).
+    """
+    total = width * height
+    majority = int(total * majority_threshold)
+    keys = rng.random((len(true_red), total))
+    cutoff = np.partition(keys, majority - 1, axis=1)[:, majority - 1:majority]
+    in_majority = keys <= cutoff
+    red = np.where(np.asarray(true_red, dtype=bool)[:, None], in_majority, ~in_majority)
+    return [base64.b64encode(row.tobytes()).decode('ascii') for row in np.packbits(red, axis=1)]
+
+def stimulus_pixels(stimulus, width=Constants.grid_width, height=Constants.grid_height):
+    """Decodes Player.stimulus back to a (height, width) boolean array, True = red."""
+    bits = np.unpackbits(np.frombuffer(base64.b64decode(stimulus), dtype=np.uint8))[:width * height]
+    return bits.reshape(height, width).astype(bool)
 
 class Subsession(BaseSubsession):
     def creating_session(self):
-        # 1. Block Counterbalancing (Blocks 1 & 2: Active/Passive; Block 3 is always Active)
-        # Advisor accuracy: A, C, E use dominant probs (30,30,20,20); B, D, F use inverse (20,20,30,30)
-        ACCURACY_LEVELS = [0.80, 0.60, 0.40, 0.20]
-        PROBS_DOMINANT = [0.30, 0.30, 0.20, 0.20]   # A, C, E: 80/60/40/20 with 30%, 30%, 20%, 20%
-        PROBS_INVERSE = [0.20, 0.20, 0.30, 0.30]    # B, D, F: 80/60/40/20 with 20%, 20%, 30%, 30%
-
+        # The whole trial schedule is drawn once, in round 1, from a per-session seed
+        # (session config 'schedule_seed', or fresh entropy; recorded in session.vars).
+        # Later rounds only read their column of the precomputed arrays.
         if self.round_number == 1:
-            # Male European-sounding names; A,C,E = Dots & Co., B,D,F = PixelHouse
-            NAMES_DOTS = ['Josh', 'Thomas', 'Lukas', 'Henrik', 'Stefan', 'Marc']
-            NAMES_PIXEL = ['Marcus', 'Niklas', 'Felix', 'Erik', 'Jonas', 'Paul']
-            for p in self.get_players():
-                # Even IDs: Active first in block 1; Odd: Passive first. Block 3 is always Active.
-                if p.id_in_group % 2 == 0:
-                    participant_vars = {'block_order': ['Active', 'Passive', 'Active']}
-                else:
-                    participant_vars = {'block_order': ['Passive', 'Active', 'Active']}
-                # Draw all six advisors independently (B, D, F use inverse odds)
-                participant_vars['accuracy_A'] = random.choices(ACCURACY_LEVELS, weights=PROBS_DOMINANT, k=1)[0]
-                participant_vars['accuracy_B'] = random.choices(ACCURACY_LEVELS, weights=PROBS_INVERSE, k=1)[0]
-                participant_vars['accuracy_C'] = random.choices(ACCURACY_LEVELS, weights=PROBS_DOMINANT, k=1)[0]
-                participant_vars['accuracy_D'] = random.choices(ACCURACY_LEVELS, weights=PROBS_INVERSE, k=1)[0]
-                participant_vars['accuracy_E'] = random.choices(ACCURACY_LEVELS, weights=PROBS_DOMINANT, k=1)[0]
-                participant_vars['accuracy_F'] = random.choices(ACCURACY_LEVELS, weights=PROBS_INVERSE, k=1)[0]
-                # Display names: "Name (Dots & Co.)" or "Name (PixelHouse)" — 3 distinct names per company so the same name never appears in two blocks
-                dots = random.sample(NAMES_DOTS, 3)
-                pixel = random.sample(NAMES_PIXEL, 3)
-                participant_vars['advisor_name_A'] = f"{dots[0]} (Dots & Co.)"
-                participant_vars['advisor_name_B'] = f"{pixel[0]} (PixelHouse)"
-                participant_vars['advisor_name_C'] = f"{dots[1]} (Dots & Co.)"
-                participant_vars['advisor_name_D'] = f"{pixel[1]} (PixelHouse)"
-                participant_vars['advisor_name_E'] = f"{dots[2]} (Dots & Co.)"
-                participant_vars['advisor_name_F'] = f"{pixel[2]} (PixelHouse)"
-                # Half of participants have 5¢ switching cost when changing advisor in Active block
-                participant_vars['has_switching_cost'] = random.choice([True, False])
-                p.participant.vars.update(participant_vars)
+            seed = self.session.config.get('schedule_seed')
+            if seed is None:
+                seed = np.random.SeedSequence().entropy
+            players = self.get_players()
+            schedule = build_schedule(np.random.default_rng(seed), len(players))
+            for has_switching_cost in (False, True):
+                advisor_policy(has_switching_cost)  # Solve missing tables now, not on a participant's request
+            self.session.vars['schedule_seed'] = seed
+            self.session.vars['schedule'] = schedule
+            for p in players:
+                row = p.id_in_subsession - 1
+                participant_vars = {'block_order': schedule['block_order'][row]}
+                for letter, accuracy, name in zip(ADVISORS, schedule['accuracy'][row], schedule['names'][row]):
+                    participant_vars[f'accuracy_{letter}'] = accuracy
+                    participant_vars[f'advisor_name_{letter}'] = name
+                participant_vars['has_switching_cost'] = schedule['has_switching_cost'][row]
+                participant_vars.update(last_advisor='', advice_counts=[0, 0, 0, 0], block_switches=[0, 0, 0])
+                participant_vars['beliefs'] = [list(PROBS_DOMINANT), list(PROBS_INVERSE)] * 3
+                p.participant.vars.update(participant_vars)  # PARTICIPANT_FIELDS in settings.py
 
+        schedule = self.session.vars['schedule']
+        r = self.round_number - 1
+        block = min(r // ROUNDS_PER_BLOCK, 2)  # Block 1: A/B, Block 2: C/D, Block 3: E/F
+        flags = schedule['flags'][:, r].tolist()
+        # Pixel layouts come from their own stream per round, so they never shift the schedule draws
+        stimulus_rng = np.random.default_rng(
+            np.random.SeedSequence(self.session.vars['schedule_seed'], spawn_key=(self.round_number,)))
+        stimuli = build_stimuli(stimulus_rng, [bool(f & TRUE_RED) for f in flags])
         for p in self.get_players():
-            # Store true advisor accuracies on player for admin/data export (same every round)
-            p.accuracy_A = p.participant.vars['accuracy_A']
-            p.accuracy_B = p.participant.vars['accuracy_B']
-            p.accuracy_C = p.participant.vars['accuracy_C']
-            p.accuracy_D = p.participant.vars['accuracy_D']
-            p.accuracy_E = p.participant.vars['accuracy_E']
-            p.accuracy_F = p.participant.vars['accuracy_F']
-            # 2. Determine Current Block (1-2, 3-4, 5-6 for testing; use 20/40/60 for real)
-            if self.round_number <= ROUNDS_PER_BLOCK:
-                current_block_idx = 0
-            elif self.round_number <= ROUNDS_PER_BLOCK * 2:
-                current_block_idx = 1
-            else:
-                current_block_idx = 2
-            p.block_type = p.participant.vars['block_order'][current_block_idx]
-            
-            # 3. Determine Truth (Red vs Blue)
-            p.true_color = random.choice(['Red', 'Blue'])
-            
-            # 4. Generate Advisor Advice (Block 1: A/B, Block 2: C/D, Block 3: E/F)
-            acc_A = p.participant.vars['accuracy_A']
-            acc_B = p.participant.vars['accuracy_B']
-            acc_C = p.participant.vars['accuracy_C']
-            acc_D = p.participant.vars['accuracy_D']
-            acc_E = p.participant.vars['accuracy_E']
-            acc_F = p.participant.vars['accuracy_F']
-
-            if self.round_number <= ROUNDS_PER_BLOCK:
-                p.advisor_high_name = p.participant.vars['advisor_name_A']
-                p.advisor_low_name = p.participant.vars['advisor_name_B']
-                if random.random() < acc_A:
-                    p.advice_high = p.true_color
-                else:
-                    p.advice_high = 'Blue' if p.true_color == 'Red' else 'Red'
-                if random.random() < acc_B:
-                    p.advice_low = p.true_color
-                else:
-                    p.advice_low = 'Blue' if p.true_color == 'Red' else 'Red'
-            elif self.round_number <= ROUNDS_PER_BLOCK * 2:
-                p.advisor_high_name = p.participant.vars['advisor_name_C']
-                p.advisor_low_name = p.participant.vars['advisor_name_D']
-                if random.random() < acc_C:
-                    p.advice_high = p.true_color
-                else:
-                    p.advice_high = 'Blue' if p.true_color == 'Red' else 'Red'
-                if random.random() < acc_D:
-                    p.advice_low = p.true_color
-                else:
-                    p.advice_low = 'Blue' if p.true_color == 'Red' else 'Red'
-            else:
-                p.advisor_high_name = p.participant.vars['advisor_name_E']
-                p.advisor_low_name = p.participant.vars['advisor_name_F']
-                if random.random() < acc_E:
-                    p.advice_high = p.true_color
-                else:
-                    p.advice_high = 'Blue' if p.true_color == 'Red' else 'Red'
-                if random.random() < acc_F:
-                    p.advice_low = p.true_color
-                else:
-                    p.advice_low = 'Blue' if p.true_color == 'Red' else 'Red'
+            row = p.id_in_subsession - 1
+            p.block_type = schedule['block_order'][row][block]
+
+            p.true_color = 'Red' if flags[row] & TRUE_RED else 'Blue'
+            p.stimulus = stimuli[row]
+            wrong_color = 'Blue' if p.true_color == 'Red' else 'Red'
+            p.advice_high = p.true_color if flags[row] & HIGH_CORRECT else wrong_color
+            p.advice_low = p.true_color if flags[row] & LOW_CORRECT else wrong_color
+            if p.block_type == 'Passive':
+                # The system picks the advisor in Passive blocks
+                p.selected_advisor_type = 'High' if flags[row] & PASSIVE_HIGH else 'Low'
+
+        if self.round_number == Constants.num_rounds:
+            del self.session.vars['schedule']  # Only needed while the session is being created
 
 class Group(BaseGroup):
     pass
@@ -142,18 +184,11 @@ class Player(BasePlayer):
     # Experimental State
     block_type = models.StringField()
     true_color = models.StringField()
+    stimulus = models.StringField()  # Pixel layout shown in ViewImage, see build_stimuli / stimulus_pixels
     
-    # Advisor Variables (true accuracies; also stored in participant.vars, here for admin/data export)
-    advisor_high_name = models.StringField()
-    advisor_low_name = models.StringField()
+    # Advisor Variables (names and true accuracies are stored once per participant, see advisor_names / custom_export)
     advice_high = models.StringField()
     advice_low = models.StringField()
-    accuracy_A = models.FloatField(blank=True, null=True)
-    accuracy_B = models.FloatField(blank=True, null=True)
-    accuracy_C = models.FloatField(blank=True, null=True)
-    accuracy_D = models.FloatField(blank=True, null=True)
-    accuracy_E = models.FloatField(blank=True, null=True)
-    accuracy_F = models.FloatField(blank=True, null=True)
     
     # User Inputs
     initial_prediction = models.StringField(choices=['Red', 'Blue'], widget=widgets.RadioSelectHorizontal)
@@ -172,20 +207,21 @@ class Player(BasePlayer):
     round_payoff = models.CurrencyField()
     switch_cost_incurred = models.CurrencyField(initial=0)
 
-    # Block-end surveys: perceived accuracy (80/60/40/20%) and WTP
-    ACCURACY_CHOICES = [[80, "80%"], [60, "60%"], [40, "40%"], [20, "20%"]]
-    confidence_A = models.IntegerField(choices=ACCURACY_CHOICES, blank=True, null=True, label="How accurate was advisor A?")
-    confidence_B = models.IntegerField(choices=ACCURACY_CHOICES, blank=True, null=True, label="How accurate was advisor B?")
-    pay_A = models.IntegerField(min=0, max=20, blank=True, null=True, label="Would pay for Team A advice (cents, 0-20)")
-    pay_B = models.IntegerField(min=0, max=20, blank=True, null=True, label="Would pay for Team B advice (cents, 0-20)")
-    confidence_C = models.IntegerField(choices=ACCURACY_CHOICES, blank=True, null=True, label="How accurate was advisor C?")
-    confidence_D = models.IntegerField(choices=ACCURACY_CHOICES, blank=True, null=True, label="How accurate was advisor D?")
-    pay_C = models.IntegerField(min=0, max=20, blank=True, null=True, label="Would pay for Team C advice (cents, 0-20)")
-    pay_D = models.IntegerField(min=0, max=20, blank=True, null=True, label="Would pay for Team D advice (cents, 0-20)")
-    confidence_E = models.IntegerField(choices=ACCURACY_CHOICES, blank=True, null=True, label="How accurate was advisor E?")
-    confidence_F = models.IntegerField(choices=ACCURACY_CHOICES, blank=True, null=True, label="How accurate was advisor F?")
-    pay_E = models.IntegerField(min=0, max=20, blank=True, null=True, label="Would pay for Team E advice (cents, 0-20)")
-    pay_F = models.IntegerField(min=0, max=20, blank=True, null=True, label="Would pay for Team F advice (cents, 0-20)")
+    # Benchmark of Active choices, not shown to participants: the DP-optimal advisor given this
+    # block's advice so far, and how much better it is (Q-value gap, in correct answers net of costs)
+    optimal_choice = models.StringField(blank=True)
+    q_gap = models.FloatField(blank=True)
+
+    # Client-side timing: {page: [rendered, first input, submitted]} in ms of performance.now()
+    # (see PageTiming.html). On the separate trial pages, page_timing carries the page's record in
+    # with its form: oTree only saves submitted inputs into Player fields listed in form_fields, and a
+    # live_method message sent on submit can be lost when the browser leaves the page. TimedPage merges
+    # it into timings and clears it, so it is always empty in the data (and left out of custom_export).
+    timings = models.LongStringField(blank=True)
+    page_timing = models.StringField(blank=True)
+
+    # Live Trial only: server time (time.time()) the image was first sent, so a reload cannot show it again
+    image_shown_at = models.FloatField(blank=True)
 
     def calculate_payoff(self):
         # 1. Determine Correctness
@@ -198,11 +234,300 @@ class Player(BasePlayer):
             self.round_payoff = cu(0)
             
         # 3. Handle Switching Costs (Active blocks only, and only for half of participants)
-        if self.block_type == 'Active' and self.participant.vars.get('has_switching_cost', False):
-            if (self.round_number - 1) % ROUNDS_PER_BLOCK != 0:  # not first trial of this block
-                prev_player = self.in_round(self.round_number - 1)
-                if prev_player.selected_advisor_type != self.selected_advisor_type:
-                    self.switch_cost_incurred = Constants.switching_cost
+        participant = self.participant
+        first_trial = (self.round_number - 1) % ROUNDS_PER_BLOCK == 0
+        switched = not first_trial and participant.last_advisor != self.selected_advisor_type
+        if self.block_type == 'Active' and participant.has_switching_cost and switched:
+            self.switch_cost_incurred = Constants.switching_cost
         
         # 4. Final Payoff Update
-        self.payoff = self.round_payoff - self.switch_cost_incurred
\ No newline at end of file
+        self.payoff = self.round_payoff - self.switch_cost_incurred
+
+        # 5. Running round state, read by the next round instead of looking up earlier Player rows
+        block = min((self.round_number - 1) // ROUNDS_PER_BLOCK, 2)
+        counts = [0, 0, 0, 0] if first_trial else list(participant.advice_counts)
+        if self.selected_advisor_type == 'High':
+            counts[0 if self.advice_high == self.true_color else 1] += 1
+        else:
+            counts[2 if self.advice_low == self.true_color else 3] += 1
+        participant.advice_counts = counts
+        participant.last_advisor = self.selected_advisor_type
+        if self.block_type == 'Active' and switched:  # Passive rounds are assigned, not chosen
+            switches = list(participant.block_switches)
+            switches[block] += 1
+            participant.block_switches = switches
+
+    def update_beliefs(self):
+        """Ideal-observer belief about the advisor whose advice was shown (same update as Gittins.update_prior)."""
+        participant = self.participant
+        block = min((self.round_number - 1) // ROUNDS_PER_BLOCK, 2)
+        advisor = 2 * block + (self.selected_advisor_type == 'Low')
+        beliefs = [list(belief) for belief in participant.beliefs]
+        correct = self.chosen_advisor()[1] == self.true_color
+        posterior = Gittins.update_prior(dict(zip(ACCURACY_LEVELS, beliefs[advisor])), correct)
+        beliefs[advisor] = [posterior[level] for level in ACCURACY_LEVELS]
+        participant.beliefs = beliefs
+
+    # --- Single-page trial (pages.Trial, session config trial_mode='live') ---
+    # The browser sends one message per step; each is checked against what has been answered so far,
+    # so steps can only happen in the same order as on the separate pages. The image step is timed on
+    # the server: it ends image_seconds after the page first showed it, whatever the browser does.
+
+    def advisor_names(self):
+        """(High, Low) names of this round's advisors, from the participant's names for its block."""
+        block = min((self.round_number - 1) // ROUNDS_PER_BLOCK, 2)
+        return (self.participant.vars[f'advisor_name_{ADVISORS[2 * block]}'],
+                self.participant.vars[f'advisor_name_{ADVISORS[2 * block + 1]}'])
+
+    def chosen_advisor(self):
+        """(name, advice) of the advisor consulted this round."""
+        high_name, low_name = self.advisor_names()
+        if self.selected_advisor_type == 'High':
+            return high_name, self.advice_high
+        return low_name, self.advice_low
+
+    def optimal_advisor(self):
+        """(advisor, Q-value gap) the DP recommends now, from this block's advice before this round."""
+        participant = self.participant
+        first_trial = (self.round_number - 1) % ROUNDS_PER_BLOCK == 0
+        counts = [0, 0, 0, 0] if first_trial else participant.advice_counts
+        last = 1 if participant.last_advisor == 'Low' else 0  # Only used by the switching-cost table
+        q_high, q_low = advisor_policy(participant.has_switching_cost).q_values(*counts, last=last)
+        choice = 'Low' if q_low > q_high else 'High'  # Ties go to High, as in Gittins.py
+        return choice, abs(float(q_high) - float(q_low))
+
+    def record_benchmark(self):
+        """Sets optimal_choice / q_gap for the advisor just selected."""
+        self.optimal_choice, self.q_gap = self.optimal_advisor()
+
+    def record_timing(self, page, record):
+        """Adds one page's [rendered, first input, submitted] to this trial's timings (bad records are dropped)."""
+        if isinstance(record, str):
+            try:
+                record = json.loads(record)
+            except ValueError:
+                return
+        if (page not in TIMED_PAGES or not isinstance(record, list) or len(record) != 3
+                or not all(t is None or (type(t) in (int, float) and t >= 0) for t in record)):
+            return
+        timings = json.loads(self.field_maybe_none('timings') or '{}')
+        timings[page] = record
+        self.timings = json.dumps(timings, separators=(',', ':'))
+
+    def live_trial(self, data):
+        """Handles one step message; returns the trial state (or an error) for the browser."""
+        step = data.get('step')
+        phase = self.trial_phase()
+        timing = data.get('timing')
+        if isinstance(timing, dict):
+            for page, record in timing.items():
+                self.record_timing(page, record)
+        # step 'viewed' (end of the image) only brings its timing: the phase says whether the image is over
+        if step == 'initial' and phase == 'initial':
+            if data.get('prediction') not in ('Red', 'Blue') or not _valid_confidence(data.get('confidence')):
+                return {'error': "Please choose Red or Blue and a confidence between 50 and 100."}
+            self.initial_prediction = data['prediction']
+            self.initial_confidence = data['confidence']
+        elif step == 'select' and phase == 'select':
+            if data.get('advisor') not in ('High', 'Low'):
+                return {'error': "Please choose an advisor."}
+            self.selected_advisor_type = data['advisor']
+            self.record_benchmark()
+        elif step == 'final' and phase == 'final':
+            if data.get('prediction') not in ('Red', 'Blue') or not _valid_confidence(data.get('confidence')):
+                return {'error': "Please choose Red or Blue and a confidence between 50 and 100."}
+            self.final_prediction = data['prediction']
+            self.final_confidence = data['confidence']
+            self.calculate_payoff()
+            self.update_beliefs()
+        return self.trial_state()
+
+    # --- Block-end survey (pages.BlockEndSurvey) ---
+    # The answers arrive as one live_method message and are stored as this block's BlockSurvey record,
+    # linked to the Player of the block's last round, so the per-trial rows carry no survey columns.
+
+    def block_survey(self):
+        """This block's BlockSurvey record, or None before the survey is submitted."""
+        surveys = BlockSurvey.filter(player=self)
+        return surveys[0] if surveys else None
+
+    def submit_survey(self, data):
+        """Stores (or replaces) the survey answers sent by the page; returns {'saved': True} or an error."""
+        if not isinstance(data, dict) or not _valid_survey(data):
+            return {'error': "Please rate both advisors and choose how much you would pay for each."}
+        answers = {field: data[field] for field in SURVEY_FIELDS}
+        survey = self.block_survey()
+        if survey is None:
+            BlockSurvey.create(player=self, block=min((self.round_number - 1) // ROUNDS_PER_BLOCK, 2) + 1, **answers)
+        else:
+            for field, value in answers.items():
+                setattr(survey, field, value)
+        return {'saved': True}
+
+    def show_image(self):
+        """Starts the image step on the first render of the Trial page; later renders keep its start time."""
+        if self.field_maybe_none('image_shown_at') is None:
+            self.image_shown_at = time.time()
+
+    def image_seconds_left(self):
+        shown_at = self.field_maybe_none('image_shown_at')
+        if shown_at is None:
+            return Constants.image_seconds
+        return max(0.0, shown_at + Constants.image_seconds - time.time())
+
+    def trial_phase(self):
+        if self.field_maybe_none('initial_prediction') is None:
+            return 'image' if self.image_seconds_left() > 0 else 'initial'
+        if self.field_maybe_none('selected_advisor_type') is None:
+            return 'select'
+        if self.field_maybe_none('final_prediction') is None:
+            return 'final'
+        return 'feedback'
+
+    def trial_state(self):
+        phase = self.trial_phase()
+        state = {'phase': phase}
+        if phase == 'image':
+            state['image_ms_left'] = round(self.image_seconds_left() * 1000)
+        if phase in ('final', 'feedback'):
+            state['advisor_name'], state['advice'] = self.chosen_advisor()
+            state['initial_prediction'] = self.initial_prediction
+            state['initial_confidence'] = self.initial_confidence
+        if phase == 'feedback':
+            state.update(
+                correct_answer=self.true_color,
+                is_correct=self.is_correct,
+                bonus=str(Constants.bonus_per_correct),
+                switch_cost=str(self.switch_cost_incurred) if self.switch_cost_incurred > 0 else None,
+                total_payoff=str(self.participant.payoff_plus_participation_fee()),
+            )
+        return state
+
+
+# Pages (or steps of the single Trial page) whose timing is recorded
+TIMED_PAGES = ('ViewImage', 'InitialPrediction', 'AdvisorSelection', 'FinalPrediction')
+
+def _valid_confidence(value):
+    return type(value) is int and 50 <= value <= 100
+
+# Block-end survey answers: perceived accuracy (%) of each advisor and willingness to pay (cents, 0-20)
+SURVEY_ACCURACY_CHOICES = [80, 60, 40, 20]
+SURVEY_FIELDS = ['confidence_high', 'confidence_low', 'pay_high', 'pay_low']
+
+def _valid_survey(data):
+    return (all(type(data.get(field)) is int for field in SURVEY_FIELDS)
+            and data['confidence_high'] in SURVEY_ACCURACY_CHOICES and data['confidence_low'] in SURVEY_ACCURACY_CHOICES
+            and 0 <= data['pay_high'] <= 20 and 0 <= data['pay_low'] <= 20)
+
+
+class BlockSurvey(ExtraModel):
+    """Block-end survey, one record per participant and block (see Player.submit_survey)."""
+    player = models.Link(Player)  # Player of the block's last round
+    block = models.IntegerField()
+    confidence_high = models.IntegerField()
+    confidence_low = models.IntegerField()
+    pay_high = models.IntegerField()
+    pay_low = models.IntegerField()
+
+
+# Long-format trial export: one row per participant and round, ordered participant by participant,
+# with the variables analyses used to rebuild in pandas derived here. Column names follow oTree's own
+# per-app export, so analysis scripts can read either file; replay.py needs this one, the only one
+# with participant.has_switching_cost.
+PLAYER_EXPORT_FIELDS = [
+    'block_type', 'true_color', 'stimulus', 'advice_high', 'advice_low',
+    'initial_prediction', 'initial_confidence', 'selected_advisor_type', 'final_prediction', 'final_confidence',
+    'is_correct', 'round_payoff', 'switch_cost_incurred', 'payoff', 'optimal_choice', 'q_gap', 'timings',
+]
+TRIAL_EXPORT_FIELDS = [
+    'block', 'trial_in_block', 'advisor_high_name', 'advisor_low_name',
+    'accuracy_high', 'accuracy_low',  # true accuracies of this block's advisors
+    'advisor_shown', 'advice_shown', 'advice_correct', 'switched',  # switched: Active blocks only
+    'exposure_ms', 'initial_ms', 'selection_ms', 'final_ms',  # first frame to submit, from timings
+]
+TIMING_EXPORT_PAGES = ['ViewImage', 'InitialPrediction', 'AdvisorSelection', 'FinalPrediction']
+
+def _page_ms(timings, page):
+    record = timings.get(page)
+    if not record or record[0] is None:
+        return None
+    return round(record[2] - record[0], 1)
+
+def trial_rows(players):
+    """Derived TRIAL_EXPORT_FIELDS of one participant's players (in round order), one list per round."""
+    participant = players[0].participant
+    accuracy = [participant.vars.get(f'accuracy_{letter}') for letter in ADVISORS]
+    names = [participant.vars.get(f'advisor_name_{letter}') for letter in ADVISORS]
+    previous = None
+    for p in players:
+        block = min((p.round_number - 1) // ROUNDS_PER_BLOCK, 2)
+        trial_in_block = p.round_number - block * ROUNDS_PER_BLOCK
+        choice = p.field_maybe_none('selected_advisor_type')
+        if choice is None or p.field_maybe_none('final_prediction') is None:
+            shown = [None, None, None, None]  # Round not played (yet)
+        else:
+            name, advice = p.chosen_advisor()
+            switched = trial_in_block > 1 and choice != previous if p.block_type == 'Active' else None
+            shown = [name, advice, advice == p.true_color, switched]
+        timings = json.loads(p.field_maybe_none('timings') or '{}')
+        yield ([block + 1, trial_in_block, names[2 * block], names[2 * block + 1],
+                accuracy[2 * block], accuracy[2 * block + 1]] + shown
+               + [_page_ms(timings, page) for page in TIMING_EXPORT_PAGES])
+        previous = choice
+
+# Ideal-observer posterior at the end of the block (participant.beliefs), per accuracy level, and its mean
+BELIEF_EXPORT_FIELDS = ([f'belief_{advisor}_{round(level * 100)}' for advisor in ('high', 'low') for level in ACCURACY_LEVELS]
+                        + ['belief_high_mean', 'belief_low_mean'])
+
+def block_beliefs(participant, block):
+    """(High, Low) posteriors over ACCURACY_LEVELS for one block, or Nones before the session has them."""
+    beliefs = participant.vars.get('beliefs')
+    if beliefs is None:
+        return [None] * len(ACCURACY_LEVELS), [None] * len(ACCURACY_LEVELS)
+    return beliefs[2 * block - 2], beliefs[2 * block - 1]
+
+def belief_columns(p):
+    """BELIEF_EXPORT_FIELDS of the block that p (the Player of a block's last round) ends."""
+    high, low = block_beliefs(p.participant, min((p.round_number - 1) // ROUNDS_PER_BLOCK, 2) + 1)
+    return (high + low + [None if high[0] is None else float(np.dot(high, ACCURACY_LEVELS)),
+                          None if low[0] is None else float(np.dot(low, ACCURACY_LEVELS))])
+
+def custom_export(players):
+    yield (['session.code', 'participant.id_in_session', 'participant.code', 'subsession.round_number']
+           + [f'player.{field}' for field in PLAYER_EXPORT_FIELDS]
+           + ['participant.block_order', 'participant.has_switching_cost']
+           + [f'trial.{field}' for field in TRIAL_EXPORT_FIELDS])
+    # oTree passes a list of every player, row-major by round. Walk it ordered by (participant, round) and
+    # finish each participant's rows before starting the next, so no per-participant copies pile up
+    ordered = sorted(players, key=lambda p: (p.participant_id, p.round_number))
+    for _, rounds in itertools.groupby(ordered, key=lambda p: p.participant_id):
+        rounds = list(rounds)
+        participant = rounds[0].participant
+        prefix = [rounds[0].session.code, participant.id_in_session, participant.code]
+        participant_columns = ['/'.join(participant.vars.get('block_order', [])),
+                               participant.vars.get('has_switching_cost')]
+        for p, trial in zip(rounds, trial_rows(rounds)):
+            yield (prefix + [p.round_number]
+                   + [p.field_maybe_none(field) for field in PLAYER_EXPORT_FIELDS]
+                   + participant_columns + trial)
+
+def custom_export_surveys(players):
+    """
+    Block-end surveys, one row per participant and completed block, with the block's advisors. Answers are
+    empty if the survey was not submitted; the belief columns are what an ideal observer of the same advice
+    would answer. (oTree lists every function of this module named custom_export* on the Data page.)
+    """
+    yield (['session.code', 'participant.id_in_session', 'participant.code', 'block',
+            'advisor_high_name', 'advisor_low_name']
+           + [f'survey.{field}' for field in SURVEY_FIELDS]
+           + [f'block.{field}' for field in BELIEF_EXPORT_FIELDS])
+    block_ends = sorted((p for p in players
+                         if p.round_number % ROUNDS_PER_BLOCK == 0 and p.field_maybe_none('final_prediction') is not None),
+                        key=lambda p: (p.participant_id, p.round_number))
+    for p in block_ends:
+        participant = p.participant
+        survey = p.block_survey()
+        yield ([p.session.code, participant.id_in_session, participant.code, p.round_number // ROUNDS_PER_BLOCK]
+               + list(p.advisor_names())
+               + [None if survey is None else getattr(survey, field) for field in SURVEY_FIELDS]
+               + belief_columns(p))
@@ -1,7 +1,34 @@
 from otree.api import Currency as cu, currency_range  # type: ignore[import-untyped]
 from ._builtin import Page, WaitPage  # type: ignore[import-untyped]
-from .models import Constants
-import random
+from .models import Constants, ACCURACY_LEVELS, PROBS_DOMINANT, PROBS_INVERSE, SURVEY_ACCURACY_CHOICES
+from . import profiling
+
+
+def live_trials(session):
+    """Session config trial_mode='live': each trial runs on the single Trial page instead of six pages."""
+    return session.config.get('trial_mode') == 'live'
+
+
+def odds_table(probs):
+    return [
+        {'accuracy': f'{round(a * 100)}% accurate', 'odds': f'{round(o * 100)}% of the time'}
+        for a, o in zip(ACCURACY_LEVELS, probs)
+    ]
+
+
+# ACCURACY / ODDS tables of AdvisorOddsIntro and BlockIntro, built once per process
+# Favorable (e.g. Dots & Co.): 30%, 30%, 20%, 20% for 80, 60, 40, 20
+# Other (e.g. PixelHouse): 20%, 20%, 30%, 30%
+TABLE_FAVORABLE = odds_table(PROBS_DOMINANT)
+TABLE_INVERSE = odds_table(PROBS_INVERSE)
+
+
+def switching_cost_text(player):
+    if not player.participant.vars.get('has_switching_cost', False):
+        return "No switching cost."
+    if (player.round_number - 1) % Constants.rounds_per_block == 0:
+        return "No switching cost (First trial of this block)."
+    return f"Switching advisors costs {Constants.switching_cost}"
 
 class Welcome(Page):
     def is_displayed(self):
@@ -14,22 +41,9 @@ class AdvisorOddsIntro(Page):
         return self.round_number == 1
 
     def vars_for_template(self):
-        # Favorable (e.g. Dots & Co.): 30%, 30%, 20%, 20% for 80, 60, 40, 20
-        # Other (e.g. PixelHouse): 20%, 20%, 30%, 30%
-        acc_pct = [80, 60, 40, 20]
-        favorable_odds = [30, 30, 20, 20]
-        inverse_odds = [20, 20, 30, 30]
-        table_favorable = [
-            {'accuracy': f'{a}% accurate', 'odds': f'{o}% of the time'}
-            for a, o in zip(acc_pct, favorable_odds)
-        ]
-        table_inverse = [
-            {'accuracy': f'{a}% accurate', 'odds': f'{o}% of the time'}
-            for a, o in zip(acc_pct, inverse_odds)
-        ]
         return {
-            'table_favorable': table_favorable,
-            'table_inverse': table_inverse,
+            'table_favorable': TABLE_FAVORABLE,
+            'table_inverse': TABLE_INVERSE,
         }
 
 
@@ -54,98 +68,134 @@ class BlockIntro(Page):
             block_high_name = self.participant.vars.get('advisor_name_E', 'Team E')
             block_low_name = self.participant.vars.get('advisor_name_F', 'Team F')
         # Same ACCURACY / ODDS table data as AdvisorOddsIntro (favorable vs inverse)
-        acc_pct = [80, 60, 40, 20]
-        table_favorable = [
-            {'accuracy': f'{a}% accurate', 'odds': f'{o}% of the time'}
-            for a, o in zip(acc_pct, [30, 30, 20, 20])
-        ]
-        table_inverse = [
-            {'accuracy': f'{a}% accurate', 'odds': f'{o}% of the time'}
-            for a, o in zip(acc_pct, [20, 20, 30, 30])
-        ]
         return {
             'block_num': block_num,
             'block_high_name': block_high_name,
             'block_low_name': block_low_name,
-            'table_favorable': table_favorable,
-            'table_inverse': table_inverse,
+            'table_favorable': TABLE_FAVORABLE,
+            'table_inverse': TABLE_INVERSE,
             'is_active': self.player.block_type == 'Active',
             'has_switching_cost': self.participant.vars.get('has_switching_cost', False)
         }
 
-class ViewImage(Page):
-    timeout_seconds = 5 
-    
+class Trial(Page):
+    """
+    The whole trial on one page: image, initial prediction, advisor, final prediction and feedback.
+    Answers go to the server as live_method messages (Player.live_trial) and are stored in the same
+    Player fields, with the same payoff logic, as on the separate pages.
+    """
+    def is_displayed(self):
+        return live_trials(self.session)
+
     def vars_for_template(self):
-        # Pass data to JS to generate the grid
+        self.player.show_image()
+        high_name, low_name = self.player.advisor_names()
         return {
-            'true_color': self.player.true_color,
-            'majority_threshold': Constants.majority_threshold
+            # Only while the image step lasts, so reloading the page cannot bring the image back
+            'stimulus': self.player.stimulus if self.player.trial_phase() == 'image' else '',
+            'grid_width': Constants.grid_width,
+            'grid_height': Constants.grid_height,
+            'image_seconds': Constants.image_seconds,
+            'high_name': high_name,
+            'low_name': low_name,
+            'is_active': self.player.block_type == 'Active',
+            'cost_text': switching_cost_text(self.player),
         }
 
-class InitialPrediction(Page):
+    def js_vars(self):
+        self.player.show_image()
+        return {'state': self.player.trial_state()}
+
+    def error_message(self, values):
+        # Moving on before the final step would skip calculate_payoff and the running round state
+        if self.player.trial_phase() != 'feedback':
+            return "Please finish the trial first."
+
+    @staticmethod
+    def live_method(player, data):
+        return {player.id_in_group: player.live_trial(data)}
+
+
+class TimedPage(Page):
+    """
+    Trial page whose client-side timing (PageTiming.html) is submitted with the form as page_timing,
+    the only way a form can hand the server a value; see Player.timings.
+    """
     form_model = 'player'
+    form_fields = []
+
+    def get_form_fields(self):
+        return self.form_fields + ['page_timing']
+
+    def before_next_page(self):
+        self.player.record_timing(type(self).__name__, self.player.field_maybe_none('page_timing'))
+        self.player.page_timing = None  # Only the merged timings are kept
+
+
+class ViewImage(TimedPage):
+    timeout_seconds = Constants.image_seconds
+
+    def is_displayed(self):
+        return not live_trials(self.session)
+    
+    def vars_for_template(self):
+        # Pass the server-generated pixel layout to JS (drawn on a canvas)
+        return {
+            'stimulus': self.player.stimulus,
+            'grid_width': Constants.grid_width,
+            'grid_height': Constants.grid_height,
+            'image_seconds': Constants.image_seconds,
+        }
+
+class InitialPrediction(TimedPage):
     form_fields = ['initial_prediction', 'initial_confidence']
     preserve_unsubmitted_inputs = True  # keep slider values if validation fails
 
-class AdvisorSelection(Page):
-    form_model = 'player'
+    def is_displayed(self):
+        return not live_trials(self.session)
+
+class AdvisorSelection(TimedPage):
     form_fields = ['selected_advisor_type']
 
     def is_displayed(self):
-        return self.player.block_type == 'Active'
+        return self.player.block_type == 'Active' and not live_trials(self.session)
 
     def vars_for_template(self):
-        has_cost = self.participant.vars.get('has_switching_cost', False)
-        if not has_cost:
-            cost_text = "No switching cost."
-        elif (self.round_number - 1) % Constants.rounds_per_block == 0:
-            cost_text = "No switching cost (First trial of this block)."
-        else:
-            cost_text = f"Switching advisors costs {Constants.switching_cost}"
+        high_name, low_name = self.player.advisor_names()
         return {
-            'high_name': self.player.advisor_high_name,
-            'low_name': self.player.advisor_low_name,
-            'cost_text': cost_text
+            'high_name': high_name,
+            'low_name': low_name,
+            'cost_text': switching_cost_text(self.player)
         }
 
+    def before_next_page(self):
+        super().before_next_page()
+        self.player.record_benchmark()
+
 class AdvisorDisplay(Page):
     # This page just shows the advice (passive or active result)
     def is_displayed(self):
-        return True
+        return not live_trials(self.session)
         
     def vars_for_template(self):
-        # If Passive, system randomly selects
-        if self.player.block_type == 'Passive':
-            # Randomly pick High or Low for display
-            self.player.selected_advisor_type = random.choice(['High', 'Low'])
-            
-        # Retrieve the specific advice based on selection
-        if self.player.selected_advisor_type == 'High':
-            advisor_name = self.player.advisor_high_name
-            advice = self.player.advice_high
-        else:
-            advisor_name = self.player.advisor_low_name
-            advice = self.player.advice_low
-            
+        # Retrieve the specific advice based on selection (in Passive blocks the system's pick,
+        # drawn with the trial schedule in creating_session)
+        advisor_name, advice = self.player.chosen_advisor()
         return {
             'advisor_name': advisor_name,
             'advice': advice,
             'is_passive': self.player.block_type == 'Passive'
         }
 
-class FinalPrediction(Page):
-    form_model = 'player'
+class FinalPrediction(TimedPage):
     form_fields = ['final_prediction', 'final_confidence']
     preserve_unsubmitted_inputs = True  # keep slider values if validation fails
 
+    def is_displayed(self):
+        return not live_trials(self.session)
+
     def vars_for_template(self):
-        if self.player.selected_advisor_type == 'High':
-            advisor_name = self.player.advisor_high_name
-            advisor_advice = self.player.advice_high
-        else:
-            advisor_name = self.player.advisor_low_name
-            advisor_advice = self.player.advice_low
+        advisor_name, advisor_advice = self.player.chosen_advisor()
         return {
             'initial_prediction': self.player.initial_prediction,
             'initial_confidence': self.player.initial_confidence,
@@ -154,16 +204,16 @@ class FinalPrediction(Page):
         }
     
     def before_next_page(self):
+        super().before_next_page()
         self.player.calculate_payoff()
+        self.player.update_beliefs()
 
 class Feedback(Page):
+    def is_displayed(self):
+        return not live_trials(self.session)
+
     def vars_for_template(self):
-        if self.player.selected_advisor_type == 'High':
-            advisor_name = self.player.advisor_high_name
-            advice_picked = self.player.advice_high
-        else:
-            advisor_name = self.player.advisor_low_name
-            advice_picked = self.player.advice_low
+        advisor_name, advice_picked = self.player.chosen_advisor()
         total_payoff = self.participant.payoff_plus_participation_fee()
         return {
             'correct_answer': self.player.true_color,
@@ -173,49 +223,52 @@ class Feedback(Page):
         }
 
 
-class Block1EndSurvey(Page):
-    form_model = 'player'
-    form_fields = ['confidence_A', 'confidence_B', 'pay_A', 'pay_B']
-    preserve_unsubmitted_inputs = True
+class BlockEndSurvey(Page):
+    """
+    Survey at the end of `block`. The answers are sent as one live_method message and stored as a
+    BlockSurvey record (Player.submit_survey); the page then submits its empty form to move on.
+    """
+    block = None
 
     def is_displayed(self):
-        return self.round_number == Constants.rounds_per_block  # end of block 1
+        return self.round_number == Constants.rounds_per_block * self.block  # last round of the block
 
     def vars_for_template(self):
-        last = self.player.in_round(Constants.rounds_per_block)
-        return {'high_name': last.advisor_high_name, 'low_name': last.advisor_low_name}
+        high_name, low_name = self.player.advisor_names()
+        return {
+            'high_name': high_name,
+            'low_name': low_name,
+            # One card per advisor in SurveyForm.html; key names the answers (confidence_high, pay_high, ...)
+            'survey_advisors': [{'key': 'high', 'name': high_name}, {'key': 'low', 'name': low_name}],
+            'accuracy_choices': SURVEY_ACCURACY_CHOICES,
+        }
 
+    def error_message(self, values):
+        if self.player.block_survey() is None:
+            return "Please answer the survey first."
 
-class Block2EndSurvey(Page):
-    form_model = 'player'
-    form_fields = ['confidence_C', 'confidence_D', 'pay_C', 'pay_D']
-    preserve_unsubmitted_inputs = True
+    @staticmethod
+    def live_method(player, data):
+        return {player.id_in_group: player.submit_survey(data)}
 
-    def is_displayed(self):
-        return self.round_number == Constants.rounds_per_block * 2  # end of block 2
 
-    def vars_for_template(self):
-        last = self.player.in_round(Constants.rounds_per_block * 2)
-        return {'high_name': last.advisor_high_name, 'low_name': last.advisor_low_name}
+class Block1EndSurvey(BlockEndSurvey):
+    block = 1
 
 
-class Block3EndSurvey(Page):
-    form_model = 'player'
-    form_fields = ['confidence_E', 'confidence_F', 'pay_E', 'pay_F']
-    preserve_unsubmitted_inputs = True
+class Block2EndSurvey(BlockEndSurvey):
+    block = 2
 
-    def is_displayed(self):
-        return self.round_number == Constants.num_rounds  # end of block 3
 
-    def vars_for_template(self):
-        last = self.player.in_round(Constants.num_rounds)
-        return {'high_name': last.advisor_high_name, 'low_name': last.advisor_low_name}
+class Block3EndSurvey(BlockEndSurvey):
+    block = 3
 
 
 page_sequence = [
     Welcome,
     AdvisorOddsIntro,
     BlockIntro,
+    Trial,
     ViewImage,
     InitialPrediction,
     AdvisorSelection,
@@ -225,4 +278,7 @@ page_sequence = [
     Block1EndSurvey,
     Block2EndSurvey,
     Block3EndSurvey
-]
\ No newline at end of file
+]
+
+if profiling.ENABLED:  # ADVISOR_PROFILE=1, see profiling.py
+    profiling.instrument(page_sequence)
@@ -0,0 +1,151 @@
+import numpy as np
+
+try:
+    from . import Gittins
+except ImportError:  # Run as a script from this folder
+    import Gittins
+
+# --- Heuristic policies vs the optimal DP policy ---
+# A policy is any function policy(state, rng) -> bool array (True = consult B) that decides for a
+# whole batch of runs at once from the BatchState arrays. compare_policies plays every policy on the
+# same true accuracies and the same outcome tapes (common random numbers), in one pass over the rounds.
+
+class BatchState:
+    """What a policy may look at in round t, one entry per simulated run."""
+    def __init__(self, t, horizon, sA, fA, sB, fB, last_B, last_correct, beliefs):
+        self.t = t
+        self.horizon = horizon
+        self.sA, self.fA, self.sB, self.fB = sA, fA, sB, fB
+        self.last_B = last_B  # Advisor consulted in round t - 1 (meaningless when t == 0)
+        self.last_correct = last_correct
+        self.beliefs = beliefs
+
+    @property
+    def mean_A(self):
+        return self.beliefs['mean_A'][self.sA, self.fA]
+
+    @property
+    def mean_B(self):
+        return self.beliefs['mean_B'][self.sB, self.fB]
+
+def optimal(table):
+    """The solved DP policy of a Gittins.PolicyTable (with or without switching cost)."""
+    choose_B = np.asarray(table.policy).astype(bool)
+    if choose_B.ndim == 1:
+        choose_B = np.stack([choose_B, choose_B], axis=1)
+
+    def policy(state, rng):
+        return choose_B[Gittins.state_index(state.sA, state.fA, state.sB, state.fB), state.last_B.astype(np.int64)]
+    return policy
+
+def greedy(state, rng):
+    """Myopic: consult the advisor with the higher expected accuracy right now (ties to A)."""
+    return state.mean_B > state.mean_A
+
+def win_stay_lose_shift(state, rng):
+    """Keep the last advisor after correct advice, switch after wrong advice; round 1 is greedy."""
+    if state.t == 0:
+        return greedy(state, rng)
+    return state.last_B ^ ~state.last_correct
+
+def thompson(state, rng):
+    """Sample an accuracy level for each advisor from its discrete posterior and follow the larger one."""
+    levels = state.beliefs['levels']
+    sample_A = levels[_sample_level(state.beliefs['cdf_A'][state.sA, state.fA], rng)]
+    sample_B = levels[_sample_level(state.beliefs['cdf_B'][state.sB, state.fB], rng)]
+    coin = rng.random(len(sample_A)) < 0.5
+    return (sample_B > sample_A) | ((sample_B == sample_A) & coin)
+
+def _sample_level(cdf, rng):
+    return np.minimum((rng.random((len(cdf), 1)) > cdf).sum(axis=1), cdf.shape[1] - 1)
+
+def ucb(bonus=1.0):
+    """Posterior mean plus bonus * sqrt(2 log(t + 1) / consults); an unconsulted advisor is tried first."""
+    def index(mean, consults, t):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(consults > 0, mean + bonus * np.sqrt(2 * np.log(t + 1) / consults), np.inf)
+
+    def policy(state, rng):
+        return index(state.mean_B, state.sB + state.fB, state.t) > index(state.mean_A, state.sA + state.fA, state.t)
+    return policy
+
+def _beliefs(prior_a, prior_b, horizon):
+    if list(prior_a) != list(prior_b):
+        raise ValueError("Both priors must list the same accuracy levels in the same order")
+    return {
+        'levels': np.array(list(prior_a), dtype=float),
+        'mean_A': Gittins.solver.posterior_means(prior_a, horizon),
+        'mean_B': Gittins.solver.posterior_means(prior_b, horizon),
+        'cdf_A': np.cumsum(Gittins.posterior_weights(prior_a, horizon), axis=2),
+        'cdf_B': np.cumsum(Gittins.posterior_weights(prior_b, horizon), axis=2),
+    }
+
+def default_policies(prior_a, prior_b, horizon, switching_cost):
+    return {
+        'optimal': optimal(Gittins.solve_dp(prior_a, prior_b, horizon, switching_cost)),
+        'greedy': greedy,
+        'win_stay_lose_shift': win_stay_lose_shift,
+        'thompson': thompson,
+        'ucb': ucb(),
+    }
+
+def compare_policies(policies=None, prior_a=Gittins.PRIOR_A, prior_b=Gittins.PRIOR_B, horizon=Gittins.HORIZON,
+                     switching_cost=0.0, n_runs=100_000, seed=None):
+    """
+    Plays every policy on shared random draws and reports, per policy: mean correct answers, mean payoff
+    net of switching costs, regret against always consulting the truly better advisor, the gap to the
+    exact optimal value, and the switch rate (switches per round after the first).
+    """
+    rng = np.random.default_rng(seed)
+    if policies is None:
+        policies = default_policies(prior_a, prior_b, horizon, switching_cost)
+    names = list(policies)
+    policy_rngs = rng.spawn(len(names))  # Stochastic policies never shift the shared draws
+    beliefs = _beliefs(prior_a, prior_b, horizon)
+
+    acc_A = Gittins.draw_accuracies(prior_a, n_runs, rng)
+    acc_B = Gittins.draw_accuracies(prior_b, n_runs, rng)
+    tape_A = rng.random((horizon, n_runs)) < acc_A
+    tape_B = rng.random((horizon, n_runs)) < acc_B
+
+    shape = (len(names), n_runs)
+    sA, fA, sB, fB, switches = (np.zeros(shape, dtype=np.int64) for _ in range(5))
+    last_B = np.zeros(shape, dtype=bool)
+    last_correct = np.zeros(shape, dtype=bool)
+    runs = np.arange(n_runs)
+    for t in range(horizon):
+        choose_B = np.stack([
+            np.asarray(policies[name](
+                BatchState(t, horizon, sA[k], fA[k], sB[k], fB[k], last_B[k], last_correct[k], beliefs),
+                policy_rngs[k]), dtype=bool)
+            for k, name in enumerate(names)])
+        is_correct = np.where(choose_B, tape_B[sB + fB, runs], tape_A[sA + fA, runs])
+        sA += ~choose_B & is_correct
+        fA += ~choose_B & ~is_correct
+        sB += choose_B & is_correct
+        fB += choose_B & ~is_correct
+        if t > 0:
+            switches += choose_B != last_B
+        last_B, last_correct = choose_B, is_correct
+
+    scores = sA + sB
+    payoffs = scores - switching_cost * switches
+    best_possible = horizon * np.maximum(acc_A, acc_B)
+    optimal_value = Gittins.solve_dp(prior_a, prior_b, horizon, switching_cost).value
+    return {
+        name: {
+            'mean_score': float(scores[k].mean()),
+            'mean_payoff': float(payoffs[k].mean()),
+            'regret': float((best_possible - payoffs[k]).mean()),
+            'gap_to_optimal': optimal_value - float(payoffs[k].mean()),
+            'switch_rate': float(switches[k].mean() / max(horizon - 1, 1)),
+        }
+        for k, name in enumerate(names)
+    }
+
+if __name__ == "__main__":
+    for label, cost in (("No switching cost", 0.0), ("Switching cost", Gittins.SWITCHING_COST)):
+        print(f"{label}:")
+        for name, row in compare_policies(switching_cost=cost, seed=0).items():
+            print(f"  {name:20s} score {row['mean_score']:.3f}  payoff {row['mean_payoff']:.3f}  "
+                  f"regret {row['regret']:.3f}  switch rate {row['switch_rate']:.3f}")
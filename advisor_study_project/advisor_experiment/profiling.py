@@ -0,0 +1,99 @@
+import atexit
+import cProfile
+import json
+import os
+import random
+import time
+from functools import wraps
+
+import numpy as np
+
+# --- Opt-in server-side timing of page hooks ---
+# With ADVISOR_PROFILE=1 in the server's environment, every call of vars_for_template, is_displayed
+# and before_next_page of the pages in page_sequence is timed and its database queries counted.
+# Records are keyed by (page, round, hook) and aggregated into latency histograms (HISTOGRAM_EDGES_MS).
+# ADVISOR_PROFILE_SAMPLE=0.05 also runs that share of calls under cProfile, accumulated per page and
+# hook. dump() writes everything to ADVISOR_PROFILE_DIR when the process exits (or when called).
+# Without ADVISOR_PROFILE the pages are left untouched.
+
+ENABLED = os.environ.get('ADVISOR_PROFILE', '') not in ('', '0')
+SAMPLE_RATE = float(os.environ.get('ADVISOR_PROFILE_SAMPLE', 0))
+PROFILE_DIR = os.environ.get('ADVISOR_PROFILE_DIR', 'page_profile')
+HOOKS = ('is_displayed', 'vars_for_template', 'before_next_page')
+HISTOGRAM_EDGES_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+class HookStats:
+    """Calls of one hook of one page in one round: count, time, queries and a latency histogram."""
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.histogram = np.zeros(len(HISTOGRAM_EDGES_MS) + 1, dtype=np.int64)  # last bin: above 1 s
+
+    def add(self, ms, queries):
+        self.calls += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.queries += queries
+        self.histogram[np.searchsorted(HISTOGRAM_EDGES_MS, ms)] += 1
+
+    def as_dict(self):
+        return {'calls': self.calls, 'total_ms': self.total_ms, 'mean_ms': self.total_ms / self.calls,
+                'max_ms': self.max_ms, 'queries': self.queries, 'histogram': self.histogram.tolist()}
+
+stats = {}     # (page, round, hook) -> HookStats
+profiles = {}  # (page, hook) -> cProfile.Profile of the sampled calls
+_queries = [0]
+
+def _count_query(*args):
+    _queries[0] += 1
+
+def timed_hook(page_name, hook, method):
+    """Wraps one page method so each call is recorded under (page_name, round, hook)."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profile = None
+        if SAMPLE_RATE and random.random() < SAMPLE_RATE:
+            profile = profiles.setdefault((page_name, hook), cProfile.Profile())
+        queries = _queries[0]
+        started = time.perf_counter()
+        try:
+            if profile is None:
+                return method(self, *args, **kwargs)
+            return profile.runcall(method, self, *args, **kwargs)
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            key = (page_name, self.round_number, hook)
+            stats.setdefault(key, HookStats()).add(ms, _queries[0] - queries)
+    return wrapper
+
+def instrument(page_sequence):
+    """Times the HOOKS of every page class in page_sequence and counts database queries."""
+    from sqlalchemy import event  # type: ignore[import-untyped]
+    from otree.database import engine  # type: ignore[import-untyped]
+    event.listen(engine, 'before_cursor_execute', _count_query)
+    for page in page_sequence:
+        for hook in HOOKS:
+            # Set on each class itself, so inherited hooks are recorded under the page that ran them
+            setattr(page, hook, timed_hook(page.__name__, hook, getattr(page, hook)))
+    atexit.register(dump)
+
+def summary():
+    """Records as a list of dicts, slowest total first."""
+    rows = [dict(page=page, round=round_number, hook=hook, **s.as_dict())
+            for (page, round_number, hook), s in stats.items()]
+    return sorted(rows, key=lambda row: -row['total_ms'])
+
+def dump(directory=None):
+    """Writes hooks.json (records and histogram edges) and one .prof file per sampled page hook."""
+    directory = directory or PROFILE_DIR
+    if not stats:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'hooks.json')
+    with open(path, 'w') as f:
+        json.dump({'histogram_edges_ms': HISTOGRAM_EDGES_MS, 'records': summary()}, f, indent=1)
+    for (page, hook), profile in profiles.items():
+        profile.dump_stats(os.path.join(directory, f'{page}.{hook}.prof'))
+    return path
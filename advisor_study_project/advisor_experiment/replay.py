@@ -0,0 +1,234 @@
+import argparse
+import csv
+import numpy as np
+
+try:
+    from . import Gittins
+except ImportError:  # Run as a script from this folder
+    import Gittins
+
+# --- Replaying participants against the optimal policy ---
+# Reads the app's custom export (models.custom_export, advisor_experiment_custom.csv on the Data page;
+# one row per participant and round) in chunks, so only the rows of the current chunk are ever held in
+# memory. Each participant's (s, f) counts per advisor, per block, are carried from chunk to chunk, so
+# files whose participants are spread over many chunks (oTree's per-app export, written round by round)
+# are scored the same way.
+#
+# Only the custom export says which participants had a switching cost (COST_COLUMN). The per-app export
+# (advisor_experiment.csv) is accepted only with assume_no_cost=True (--assume-no-switching-cost), which
+# scores everyone against the table without switching cost.
+#
+# The High advisor is advisor A of the DP (PRIOR_A odds) and the Low advisor is B. Counts restart
+# at every block because each block introduces a new pair of advisors. Passive rounds still count as
+# observations but are not decisions, so they get no regret. Regret is in correct answers, the unit
+# of the Q-values (switching costs included, see Gittins.SWITCHING_COST).
+
+COLUMNS = {
+    'code': 'participant.code',
+    'round': 'subsession.round_number',
+    'block_type': 'player.block_type',
+    'choice': 'player.selected_advisor_type',
+    'true_color': 'player.true_color',
+    'advice_high': 'player.advice_high',
+    'advice_low': 'player.advice_low',
+    'final_prediction': 'player.final_prediction',
+}
+# oTree's per-app export has no round column: rows are then numbered per participant in file order,
+# which is round order because oTree writes the file round by round
+ROUND_COLUMN = COLUMNS['round']
+# Only in the app's custom export (models.custom_export): participants with a switching cost are
+# scored against the cost-aware table
+COST_COLUMN = 'participant.has_switching_cost'
+NUM_BLOCKS = 3
+
+ROUND_FIELDS = ['participant_code', 'round', 'block', 'block_type', 'choice', 'optimal_choice',
+                'sA', 'fA', 'sB', 'fB', 'q_high', 'q_low', 'regret']
+BLOCK_FIELDS = ['participant_code', 'block', 'block_type', 'decisions', 'optimal_decisions',
+                'total_regret', 'mean_regret']
+
+def read_chunks(path, chunk_size=50_000, assume_no_cost=False):
+    """
+    Yields dicts of column name -> numpy string array, `chunk_size` rows at a time.
+    Without COST_COLUMN the file is refused, unless assume_no_cost says no participant had a switching cost.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        missing = [column for column in COLUMNS.values() if column not in header and column != ROUND_COLUMN]
+        if missing:
+            raise ValueError(f"{path} is not an advisor_experiment export (missing {', '.join(missing)})")
+        if COST_COLUMN not in header and not assume_no_cost:
+            raise ValueError(f"{path} has no {COST_COLUMN} column, so switching-cost participants would be scored "
+                             "without their cost; use the app's custom export (advisor_experiment_custom.csv), "
+                             "or assume_no_cost if the session had no switching cost")
+        wanted = {name: column for name, column in COLUMNS.items() if column in header}
+        if COST_COLUMN in header:
+            wanted['has_cost'] = COST_COLUMN
+        positions = {name: header.index(column) for name, column in wanted.items()}
+        rounds_seen = None if ROUND_COLUMN in header else {}
+
+        def chunk(rows):
+            columns = {name: np.array([r[i] for r in rows]) for name, i in positions.items()}
+            if rounds_seen is not None:
+                numbers = []
+                for code in columns['code'].tolist():
+                    rounds_seen[code] = rounds_seen.get(code, 0) + 1
+                    numbers.append(str(rounds_seen[code]))
+                columns['round'] = np.array(numbers)
+            return columns
+
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield chunk(rows)
+                rows = []
+        if rows:
+            yield chunk(rows)
+
+class Replay:
+    """Per-participant state carried across chunks of one export."""
+    def __init__(self, rounds_per_block, prior_a=Gittins.PRIOR_A, prior_b=Gittins.PRIOR_B,
+                 switching_cost=Gittins.SWITCHING_COST):
+        self.rounds_per_block = rounds_per_block
+        self.q_free = np.asarray(Gittins.get_policy(prior_a, prior_b, rounds_per_block).q)
+        self.q_cost = np.asarray(Gittins.get_policy(prior_a, prior_b, rounds_per_block, switching_cost).q)
+        self.codes = {}
+        self.code_list = []
+        self.counts = np.zeros((0, NUM_BLOCKS, 4), dtype=np.int64)  # sA, fA, sB, fB before the next round
+        self.last_B = np.zeros((0, NUM_BLOCKS), dtype=bool)
+        self.block_type = np.zeros((0, NUM_BLOCKS), dtype='<U7')
+        self.decisions = np.zeros((0, NUM_BLOCKS), dtype=np.int64)
+        self.optimal_decisions = np.zeros((0, NUM_BLOCKS), dtype=np.int64)
+        self.regret = np.zeros((0, NUM_BLOCKS))
+
+    def _participant_ids(self, codes):
+        unique, inverse = np.unique(codes, return_inverse=True)
+        for code in unique:
+            if code not in self.codes:
+                self.codes[code] = len(self.code_list)
+                self.code_list.append(code)
+        grow = len(self.code_list) - len(self.counts)
+        if grow:
+            self.counts = np.concatenate([self.counts, np.zeros((grow, NUM_BLOCKS, 4), dtype=np.int64)])
+            self.last_B = np.concatenate([self.last_B, np.zeros((grow, NUM_BLOCKS), dtype=bool)])
+            self.block_type = np.concatenate([self.block_type, np.zeros((grow, NUM_BLOCKS), dtype='<U7')])
+            self.decisions = np.concatenate([self.decisions, np.zeros((grow, NUM_BLOCKS), dtype=np.int64)])
+            self.optimal_decisions = np.concatenate([self.optimal_decisions, np.zeros((grow, NUM_BLOCKS), dtype=np.int64)])
+            self.regret = np.concatenate([self.regret, np.zeros((grow, NUM_BLOCKS))])
+        return np.array([self.codes[code] for code in unique], dtype=np.int64)[inverse]
+
+    def process(self, chunk):
+        """Scores one chunk; returns its played rounds as a dict of ROUND_FIELDS columns."""
+        # Rounds a participant never reached have no final prediction (Passive picks are drawn in advance)
+        played = np.isin(chunk['choice'], ('High', 'Low')) & np.isin(chunk['final_prediction'], ('Red', 'Blue'))
+        chunk = {name: values[played] for name, values in chunk.items()}
+        pid = self._participant_ids(chunk['code'])
+        rnd = chunk['round'].astype(np.int64)
+        if len(rnd) and rnd.max() > NUM_BLOCKS * self.rounds_per_block:
+            raise ValueError(f"Round {rnd.max()} is past the last block; is rounds_per_block={self.rounds_per_block} right?")
+        block = (rnd - 1) // self.rounds_per_block
+
+        order = np.lexsort((rnd, pid))
+        pid, rnd, block = pid[order], rnd[order], block[order]
+        chunk = {name: values[order] for name, values in chunk.items()}
+        choose_B = chunk['choice'] == 'Low'
+        is_correct = np.where(choose_B, chunk['advice_low'], chunk['advice_high']) == chunk['true_color']
+        active = chunk['block_type'] == 'Active'
+        has_cost = np.isin(chunk['has_cost'], ('1', 'True', 'true')) if 'has_cost' in chunk else np.zeros(len(pid), bool)
+
+        # Counts before each row: carried counts plus this chunk's earlier rows of the same block
+        increments = np.stack([~choose_B & is_correct, ~choose_B & ~is_correct,
+                               choose_B & is_correct, choose_B & ~is_correct], axis=1).astype(np.int64)
+        segment = pid * NUM_BLOCKS + block
+        starts = np.flatnonzero(np.r_[True, segment[1:] != segment[:-1]][:len(segment)])  # none in an unplayed chunk
+        lengths = np.diff(np.r_[starts, len(segment)])
+        before = np.cumsum(increments, axis=0) - increments
+        before -= np.repeat(before[starts], lengths, axis=0)
+        before += self.counts[pid, block]
+        if np.any(before.sum(axis=1) != (rnd - 1) % self.rounds_per_block):
+            raise ValueError("Rounds are missing or out of order for some participants")
+
+        prev_B = np.r_[False, choose_B[:-1]][:len(choose_B)]
+        prev_B[starts] = self.last_B[pid[starts], block[starts]]
+
+        index = Gittins.state_index(*before.T)
+        q = np.where(has_cost[:, None], self.q_cost[index, prev_B.astype(np.int64)], self.q_free[index]) \
+            if self.q_cost.ndim == 3 else self.q_free[index]
+        optimal_B = q[:, 1] > q[:, 0]
+        regret = np.where(active, q.max(axis=1) - np.where(choose_B, q[:, 1], q[:, 0]), np.nan)
+
+        ends = starts + lengths - 1
+        self.counts[pid[ends], block[ends]] = before[ends] + increments[ends]
+        self.last_B[pid[ends], block[ends]] = choose_B[ends]
+        self.block_type[pid[ends], block[ends]] = chunk['block_type'][ends]
+        np.add.at(self.decisions, (pid, block), active)
+        np.add.at(self.optimal_decisions, (pid, block), active & (optimal_B == choose_B))
+        np.add.at(self.regret, (pid, block), np.where(active, regret, 0.0))
+
+        return {
+            'participant_code': chunk['code'],
+            'round': rnd,
+            'block': block + 1,
+            'block_type': chunk['block_type'],
+            'choice': chunk['choice'],
+            'optimal_choice': np.where(optimal_B, 'Low', 'High'),
+            'sA': before[:, 0], 'fA': before[:, 1], 'sB': before[:, 2], 'fB': before[:, 3],
+            'q_high': q[:, 0], 'q_low': q[:, 1],
+            'regret': regret,
+        }
+
+    def block_summary(self):
+        """Per participant and block, as a dict of BLOCK_FIELDS columns (blocks never reached are left out)."""
+        pid, block = np.nonzero(self.block_type != '')
+        decisions = self.decisions[pid, block]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_regret = np.where(decisions > 0, self.regret[pid, block] / decisions, np.nan)
+        return {
+            'participant_code': np.array(self.code_list)[pid] if len(pid) else np.array([]),
+            'block': block + 1,
+            'block_type': self.block_type[pid, block],
+            'decisions': decisions,
+            'optimal_decisions': self.optimal_decisions[pid, block],
+            'total_regret': self.regret[pid, block],
+            'mean_regret': mean_regret,
+        }
+
+def _write(writer, columns, fields):
+    writer.writerows(zip(*(columns[field].tolist() for field in fields)))
+
+def replay_export(path, rounds_per_block=Gittins.HORIZON, rounds_out='replay_rounds.csv',
+                  blocks_out='replay_blocks.csv', chunk_size=50_000, assume_no_cost=False):
+    """Scores a whole export; writes per-round and per-block regret CSVs and returns the Replay."""
+    replay = Replay(rounds_per_block)
+    n_rows = 0
+    with open(rounds_out, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(ROUND_FIELDS)
+        for chunk in read_chunks(path, chunk_size, assume_no_cost):
+            rows = replay.process(chunk)
+            _write(writer, rows, ROUND_FIELDS)
+            n_rows += len(rows['round'])
+    with open(blocks_out, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(BLOCK_FIELDS)
+        _write(writer, replay.block_summary(), BLOCK_FIELDS)
+    print(f"Replayed {n_rows} rounds of {len(replay.code_list)} participants -> {rounds_out}, {blocks_out}")
+    return replay
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-decision regret of participants against the optimal policy.")
+    parser.add_argument('export', help="the app's custom export (advisor_experiment_custom.csv)")
+    parser.add_argument('--rounds-per-block', type=int, default=Gittins.HORIZON)
+    parser.add_argument('--rounds-out', default='replay_rounds.csv')
+    parser.add_argument('--blocks-out', default='replay_blocks.csv')
+    parser.add_argument('--chunk-size', type=int, default=50_000)
+    parser.add_argument('--assume-no-switching-cost', action='store_true',
+                        help="accept an export without participant.has_switching_cost (e.g. the per-app "
+                             "advisor_experiment.csv) and score everyone without switching cost")
+    args = parser.parse_args(argv)
+    replay_export(args.export, args.rounds_per_block, args.rounds_out, args.blocks_out, args.chunk_size,
+                  args.assume_no_switching_cost)
+
+if __name__ == "__main__":
+    main()
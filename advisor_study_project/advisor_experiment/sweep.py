@@ -0,0 +1,107 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from . import Gittins
+except ImportError:  # Run as a script from this folder
+    import Gittins
+
+# --- Parameter sweeps over priors, horizons and switching costs ---
+# Instead of one backward induction per horizon, the DP is run by rounds-to-go: W_r(x) is the best
+# value with r rounds left from counts x. W_r only needs W_(r-1), so one pass up to the largest horizon
+# yields the start value W_h(0) of every shorter horizon h as well. Posterior-mean tables come from
+# Gittins.solver and are shared by every sweep point (and cost) that uses the same prior.
+
+def tilted_prior(prior, tilt):
+    """Perturbation of a prior: p(acc) scaled by exp(tilt * (acc - mean)), renormalized. tilt=0 is the prior itself."""
+    mean = Gittins.get_expected_accuracy(prior)
+    weights = {acc: prob * np.exp(tilt * (acc - mean)) for acc, prob in prior.items()}
+    total = sum(weights.values())
+    return {acc: w / total for acc, w in weights.items()}
+
+def default_prior_pairs(tilts=(-1.0, -0.5, 0.0, 0.5, 1.0)):
+    """The experiment's (PRIOR_A, PRIOR_B) odds with both priors tilted by each amount."""
+    return [(tilted_prior(Gittins.PRIOR_A, tilt), tilted_prior(Gittins.PRIOR_B, tilt)) for tilt in tilts]
+
+def solve_all_horizons(prior_a, prior_b, max_horizon, switching_cost=0.0, table_horizons=()):
+    """
+    Expected optimal score (net of switching costs) for every horizon 1..max_horizon in one pass.
+    Returns (values, tables): values[h] for h = 0..max_horizon, and the Q-table of each horizon in
+    `table_horizons`, identical to Gittins.solve_dp(prior_a, prior_b, h, switching_cost).q.
+    """
+    mean_A = Gittins.solver.posterior_means(prior_a, max_horizon)
+    mean_B = Gittins.solver.posterior_means(prior_b, max_horizon)
+    n_last = 2 if switching_cost else 1
+    tables = {h: np.empty((Gittins.num_states(h), 2, 2) if switching_cost else (Gittins.num_states(h), 2))
+              for h in table_horizons}
+    values = np.zeros(max_horizon + 1)
+
+    # W_0 = 0 for every state (and last choice)
+    w_prev = np.zeros((Gittins.num_states(max_horizon + 1), n_last))
+    for r in range(1, max_horizon + 1):
+        w = np.empty((Gittins.num_states(max_horizon - r + 1), n_last))
+        for t in range(max_horizon - r + 1):
+            nxt = w_prev[Gittins.num_states(t + 1):Gittins.num_states(t + 2)]
+            q_A, q_B = Gittins._layer_q(t, nxt[:, 0], mean_A, mean_B, v_next_B=nxt[:, -1])
+            layer = slice(Gittins.num_states(t), Gittins.num_states(t + 1))
+            if switching_cost:
+                cost = switching_cost if t > 0 else 0.0  # First trial of a block is never charged
+                q = np.stack([np.stack([q_A, q_B - cost], axis=1), np.stack([q_A - cost, q_B], axis=1)], axis=1)
+            else:
+                q = np.stack([q_A, q_B], axis=1)
+            w[layer] = q.max(axis=-1).reshape(len(q_A), n_last)
+            if t + r in tables:
+                tables[t + r][layer] = q
+        values[r] = w[0, 0]
+        w_prev = w
+    return values, tables
+
+def _sweep_point(pair_id, prior_a, prior_b, switching_cost, max_horizon, table_horizons):
+    values, tables = solve_all_horizons(prior_a, prior_b, max_horizon, switching_cost, table_horizons)
+    return pair_id, switching_cost, values, tables
+
+def sweep(prior_pairs=None, horizons=range(2, 61), switching_costs=(0.0, Gittins.SWITCHING_COST),
+          workers=None, table_horizons=()):
+    """
+    Expected optimal scores over the grid prior_pairs x horizons x switching_costs. Each
+    (prior pair, cost) point is one rounds-to-go pass, run in parallel across a process pool
+    (workers=1 runs in-process). Returns a dict of equal-length columns, plus 'q_<row>' Q-tables
+    for rows whose horizon is in `table_horizons`.
+    """
+    prior_pairs = default_prior_pairs() if prior_pairs is None else prior_pairs
+    horizons = sorted(horizons)
+    levels = sorted(prior_pairs[0][0])
+    tasks = [(i, a, b, float(c), horizons[-1], tuple(table_horizons))
+             for i, (a, b) in enumerate(prior_pairs) for c in switching_costs]
+
+    if workers == 1:
+        points = [_sweep_point(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            points = [future.result() for future in as_completed([pool.submit(_sweep_point, *task) for task in tasks])]
+    points.sort(key=lambda point: (point[0], point[1]))
+
+    rows = [(pair_id, h, cost, values[h]) for pair_id, cost, values, _ in points for h in horizons]
+    pair_id, horizon, cost, score = (np.array(column) for column in zip(*rows))
+    results = {
+        'pair_id': pair_id,
+        'horizon': horizon,
+        'switching_cost': cost,
+        'expected_score': score,
+        'accuracy_levels': np.array(levels),
+        'prior_a': np.array([[prior_pairs[i][0][acc] for acc in levels] for i in pair_id]),
+        'prior_b': np.array([[prior_pairs[i][1][acc] for acc in levels] for i in pair_id]),
+    }
+    for row, (point_pair, point_cost, h) in enumerate(zip(pair_id, cost, horizon)):
+        for p, c, _, tables in points:
+            if p == point_pair and c == point_cost and h in tables:
+                results[f'q_{row}'] = tables[h]
+    return results
+
+def save_sweep(results, path='sweep_results.npz'):
+    np.savez_compressed(path, **results)
+    print(f"Saved {path} ({len(results['horizon'])} rows)")
+    return path
+
+if __name__ == "__main__":
+    save_sweep(sweep(table_horizons=(Gittins.HORIZON,)))
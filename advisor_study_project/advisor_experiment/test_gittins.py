@@ -0,0 +1,191 @@
+import csv
+import numpy as np
+import pytest
+from functools import lru_cache
+
+try:
+    from . import Gittins, replay, sweep
+except ImportError:  # Run from this folder
+    import Gittins
+    import replay
+    import sweep
+
+# --- Checks of the vectorized DP against a direct recursion over the belief states ---
+# Run with `python -m pytest advisor_experiment/test_gittins.py`. (tests.py holds the oTree bots.)
+
+HORIZON = 5
+COSTS = [0.0, Gittins.SWITCHING_COST]
+
+@pytest.fixture
+def artifact_dir(tmp_path, monkeypatch):
+    """A temporary GITTINS_ARTIFACT_DIR, so tests never touch the real artifact store."""
+    monkeypatch.setenv('GITTINS_ARTIFACT_DIR', str(tmp_path))
+    monkeypatch.setattr(Gittins, 'ARTIFACT_DIR', str(tmp_path))  # Read at import time
+    return tmp_path
+
+def posterior(prior, successes, failures):
+    for _ in range(successes):
+        prior = Gittins.update_prior(prior, True)
+    for _ in range(failures):
+        prior = Gittins.update_prior(prior, False)
+    return prior
+
+def reference_q(prior_a, prior_b, horizon, switching_cost):
+    """q(sA, fA, sB, fB, last) -> (qA, qB) by plain recursion; the first round is never charged."""
+    @lru_cache(maxsize=None)
+    def q(sA, fA, sB, fB, last):
+        if sA + fA + sB + fB == horizon:
+            return 0.0, 0.0
+        first = sA + fA + sB + fB == 0
+        p_A = Gittins.get_expected_accuracy(posterior(prior_a, sA, fA))
+        p_B = Gittins.get_expected_accuracy(posterior(prior_b, sB, fB))
+        q_A = p_A * (1 + max(q(sA + 1, fA, sB, fB, 0))) + (1 - p_A) * max(q(sA, fA + 1, sB, fB, 0))
+        q_B = p_B * (1 + max(q(sA, fA, sB + 1, fB, 1))) + (1 - p_B) * max(q(sA, fA, sB, fB + 1, 1))
+        if not first:
+            q_A -= switching_cost * (last == 1)
+            q_B -= switching_cost * (last == 0)
+        return q_A, q_B
+    return q
+
+@pytest.mark.parametrize('switching_cost', COSTS)
+def test_solve_dp_matches_recursion(switching_cost):
+    table = Gittins.solve_dp(Gittins.PRIOR_A, Gittins.PRIOR_B, HORIZON, switching_cost)
+    q = reference_q(Gittins.PRIOR_A, Gittins.PRIOR_B, HORIZON, switching_cost)
+    for t in range(HORIZON):
+        for sA, fA, sB, fB in zip(*Gittins.layer_states(t)):
+            for last in (0, 1):
+                expected = q(sA, fA, sB, fB, last)
+                assert np.allclose(table.q_values(sA, fA, sB, fB, last), expected, rtol=0, atol=1e-12)
+    assert table.value == pytest.approx(max(q(0, 0, 0, 0, 0)), abs=1e-12)
+
+@pytest.mark.parametrize('switching_cost', COSTS)
+def test_score_distribution_mean_is_policy_value(switching_cost):
+    table = Gittins.solve_dp(Gittins.PRIOR_A, Gittins.PRIOR_B, HORIZON, switching_cost)
+    distribution = Gittins.score_distribution(table)
+    assert distribution.probabilities.sum() == pytest.approx(1.0, abs=1e-12)
+    # The score counts correct answers only; the DP value is net of the expected switching costs
+    net_mean = distribution.mean - switching_cost * distribution.expected_switches
+    assert net_mean == pytest.approx(table.value, abs=1e-12)
+    evaluated = Gittins.evaluate_policy(table.policy, Gittins.PRIOR_A, Gittins.PRIOR_B, HORIZON, switching_cost)
+    assert evaluated == pytest.approx(table.value, abs=1e-12)
+
+@pytest.mark.parametrize('switching_cost', COSTS)
+def test_sweep_tables_match_solve_dp(switching_cost):
+    values, tables = sweep.solve_all_horizons(Gittins.PRIOR_A, Gittins.PRIOR_B, HORIZON, switching_cost,
+                                              table_horizons=(HORIZON,))
+    table = Gittins.solve_dp(Gittins.PRIOR_A, Gittins.PRIOR_B, HORIZON, switching_cost)
+    assert np.allclose(tables[HORIZON], table.q, rtol=0, atol=1e-12)
+    assert values[HORIZON] == pytest.approx(table.value, abs=1e-12)
+
+@pytest.mark.parametrize('switching_cost', COSTS)
+def test_parallel_simulation_is_independent_of_workers(switching_cost):
+    table = Gittins.solve_dp(Gittins.PRIOR_A, Gittins.PRIOR_B, HORIZON, switching_cost)
+    # 1000 runs in chunks of 128: eight chunks, the last one short, spread over two workers
+    serial, _ = Gittins.run_parallel_simulation(table, 1000, seed=7, workers=1, chunk_size=128, verbose=False)
+    parallel, _ = Gittins.run_parallel_simulation(table, 1000, seed=7, workers=2, chunk_size=128, verbose=False)
+    for field, a, b in zip(Gittins.SimulationResult._fields, serial, parallel):
+        assert np.array_equal(a, b), field
+
+@pytest.mark.parametrize('switching_cost', COSTS)
+def test_policy_artifact_round_trip(artifact_dir, switching_cost):
+    # Levels deliberately out of sorted order (and priors no other test solves, so the DPSolver cache
+    # keeps them as given): a loaded table must list them as the solved one does
+    prior_a = {0.2: 0.10, 0.8: 0.40, 0.4: 0.25, 0.6: 0.25}
+    prior_b = {0.6: 0.15, 0.2: 0.35, 0.8: 0.15, 0.4: 0.35}
+    table = Gittins.solve_dp(prior_a, prior_b, HORIZON, switching_cost)
+    assert list(table.prior_a.items()) == list(prior_a.items())
+    q_path = Gittins.save_policy(table)
+    assert q_path.startswith(str(artifact_dir))
+    loaded = Gittins.load_policy(prior_a, prior_b, HORIZON, switching_cost)
+    assert isinstance(loaded.q, np.memmap) and loaded.q.filename == q_path
+    assert np.array_equal(loaded.q, table.q)
+    assert list(loaded.prior_a.items()) == list(prior_a.items())
+    assert list(loaded.prior_b.items()) == list(prior_b.items())
+    assert (loaded.horizon, loaded.switching_cost) == (HORIZON, switching_cost)
+
+# --- Participant replay (replay.py) ---
+
+def write_export(path, rounds_per_block, participants=5, seed=0, round_column=True, cost_column=True):
+    """
+    A small per-app export in oTree's order (round by round), with a cost column. The last participant
+    stops after a few rounds, so its later rows are unplayed.
+    """
+    rng = np.random.default_rng(seed)
+    columns = list(replay.COLUMNS.values()) + [replay.COST_COLUMN]
+    if not round_column:
+        columns.remove(replay.ROUND_COLUMN)
+    if not cost_column:
+        columns.remove(replay.COST_COLUMN)
+    orders = [['Active', 'Passive', 'Active'] if i % 2 else ['Passive', 'Active', 'Active'] for i in range(participants)]
+    colors = ['Red', 'Blue']
+    rows = []
+    for rnd in range(1, replay.NUM_BLOCKS * rounds_per_block + 1):
+        for i in range(participants):
+            played = i < participants - 1 or rnd <= rounds_per_block + 1
+            row = {
+                'participant.code': f'p{i}',
+                'subsession.round_number': rnd,
+                'player.block_type': orders[i][(rnd - 1) // rounds_per_block],
+                'player.selected_advisor_type': rng.choice(['High', 'Low']),
+                'player.true_color': rng.choice(colors),
+                'player.advice_high': rng.choice(colors),
+                'player.advice_low': rng.choice(colors),
+                'player.final_prediction': rng.choice(colors) if played else '',
+                replay.COST_COLUMN: str(i % 3 == 0),
+            }
+            rows.append([row[column] for column in columns])
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+def replayed(tmp_path, export, chunk_size, rounds_per_block):
+    """(header, sorted round rows, block summary) of one replay; rounds come out in per-chunk order."""
+    rounds_out, blocks_out = tmp_path / f'rounds-{chunk_size}.csv', tmp_path / f'blocks-{chunk_size}.csv'
+    replay.replay_export(export, rounds_per_block, rounds_out, blocks_out, chunk_size)
+    header, *rounds = rounds_out.read_text().splitlines()
+    return header, sorted(rounds), blocks_out.read_text()
+
+def test_replay_is_independent_of_chunk_size(tmp_path, artifact_dir):
+    rounds_per_block = 4
+    export = tmp_path / 'export.csv'
+    write_export(export, rounds_per_block)
+    whole = replayed(tmp_path, export, 100_000, rounds_per_block)
+    for chunk_size in (1, 7):
+        assert replayed(tmp_path, export, chunk_size, rounds_per_block) == whole
+    # Without a round column, rounds are numbered per participant in file order
+    write_export(export, rounds_per_block, round_column=False)
+    assert replayed(tmp_path, export, 7, rounds_per_block) == whole
+
+def test_replay_refuses_an_export_without_switching_costs(tmp_path, artifact_dir):
+    export = tmp_path / 'export.csv'
+    write_export(export, 2, cost_column=False)
+    with pytest.raises(ValueError, match=replay.COST_COLUMN):
+        replay.replay_export(export, 2, tmp_path / 'rounds.csv', tmp_path / 'blocks.csv')
+    # Accepted when told nobody had a switching cost: every q_low / q_high then comes from the free table
+    rounds_out = tmp_path / 'rounds.csv'
+    replay.replay_export(export, 2, rounds_out, tmp_path / 'blocks.csv', assume_no_cost=True)
+    with open(rounds_out) as f:
+        rows = list(csv.DictReader(f))
+    free = Gittins.get_policy(Gittins.PRIOR_A, Gittins.PRIOR_B, 2)
+    for row in rows:
+        expected = free.q_values(*(int(row[field]) for field in ('sA', 'fA', 'sB', 'fB')))
+        assert (float(row['q_high']), float(row['q_low'])) == pytest.approx(expected, abs=1e-12)
+
+def test_replay_regret_matches_hand_computation(artifact_dir):
+    # Two-round block without switching cost. Prior means: High 0.54, Low 0.46. With A = High:
+    # qA = 0.54 + 0.54 * (0.34 / 0.54) + 0.46 * 0.46 = 1.0916 and qB = 0.46 + 0.46 * (0.26 / 0.46) + 0.54 * 0.54 = 1.0116,
+    # so choosing Low first costs 0.08. Once Low was right its mean is 0.26 / 0.46 > 0.54, so High then costs the gap.
+    chunk = {
+        'code': np.array(['p', 'p']),
+        'round': np.array(['1', '2']),
+        'block_type': np.array(['Active', 'Active']),
+        'choice': np.array(['Low', 'High']),
+        'true_color': np.array(['Red', 'Blue']),
+        'advice_high': np.array(['Blue', 'Blue']),
+        'advice_low': np.array(['Red', 'Red']),
+        'final_prediction': np.array(['Red', 'Blue']),
+    }
+    rows = replay.Replay(rounds_per_block=2).process(chunk)
+    assert rows['optimal_choice'].tolist() == ['High', 'Low']
+    assert rows['regret'].tolist() == pytest.approx([0.08, 0.26 / 0.46 - 0.54], abs=1e-12)
@@ -0,0 +1,148 @@
+import base64
+import numpy as np
+import pytest
+from types import SimpleNamespace
+
+pytest.importorskip('otree.api')
+
+from . import Gittins, models
+
+# --- Checks of the session-setup helpers in models.py (needs oTree installed; test_gittins.py does not) ---
+# Run from the project folder (oTree reads settings.py from there): `python -m pytest advisor_experiment/test_models.py`.
+
+MAJORITY = int(models.Constants.total_pixels * models.Constants.majority_threshold)
+
+def test_stimulus_encodes_the_majority_color():
+    true_red = [True, False, True, False]
+    stimuli = models.build_stimuli(np.random.default_rng(3), true_red)
+    assert len(stimuli) == len(true_red)
+    for stimulus, red in zip(stimuli, true_red):
+        assert len(base64.b64decode(stimulus)) == models.Constants.total_pixels // 8  # 25 packed bytes
+        pixels = models.stimulus_pixels(stimulus)
+        assert pixels.shape == (models.Constants.grid_height, models.Constants.grid_width)
+        assert pixels.sum() == (MAJORITY if red else models.Constants.total_pixels - MAJORITY)
+
+def test_stimuli_are_reproducible_from_the_seed():
+    true_red = [True, False, True]
+    first = models.build_stimuli(np.random.default_rng(11), true_red)
+    assert models.build_stimuli(np.random.default_rng(11), true_red) == first
+    assert models.build_stimuli(np.random.default_rng(12), true_red) != first
+
+
+# --- Session setup on stand-in objects (Subsession.creating_session only needs these attributes) ---
+
+@pytest.fixture
+def artifact_dir(tmp_path, monkeypatch):
+    """A temporary artifact store and an empty table cache, for the policies creating_session loads."""
+    monkeypatch.setattr(Gittins, 'ARTIFACT_DIR', str(tmp_path))
+    monkeypatch.setattr(models, '_policies', {})
+    return tmp_path
+
+class FakeParticipant:
+    """participant.vars, with PARTICIPANT_FIELDS readable and writable as attributes like on oTree's Participant."""
+    def __init__(self):
+        self.__dict__['vars'] = {}
+
+    def __getattr__(self, name):
+        try:
+            return self.vars[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self.vars[name] = value
+
+class FakePlayer:
+    advisor_names = models.Player.advisor_names
+    chosen_advisor = models.Player.chosen_advisor
+    update_beliefs = models.Player.update_beliefs
+
+    def __init__(self, participant, id_in_subsession, round_number):
+        self.participant = participant
+        self.id_in_subsession = id_in_subsession
+        self.round_number = round_number
+        self.selected_advisor_type = None
+
+def create_session(num_players, seed):
+    """Runs creating_session for every round; returns the players by round and the round-1 schedule."""
+    session = SimpleNamespace(config={'schedule_seed': seed}, vars={})
+    participants = [FakeParticipant() for _ in range(num_players)]
+    rounds, schedule = [], None
+    for round_number in range(1, models.Constants.num_rounds + 1):
+        players = [FakePlayer(participant, i + 1, round_number) for i, participant in enumerate(participants)]
+        subsession = SimpleNamespace(round_number=round_number, session=session, get_players=lambda: players)
+        models.Subsession.creating_session(subsession)
+        if round_number == 1:
+            schedule = dict(session.vars['schedule'], flags=session.vars['schedule']['flags'].copy())
+        rounds.append(players)
+    assert 'schedule' not in session.vars  # Dropped once the last round is set up
+    return rounds, schedule
+
+def reference_trials(seed, num_players, num_rounds=models.Constants.num_rounds):
+    """build_schedule's trial draws replayed one player and round at a time, in the same draw order."""
+    rng = np.random.default_rng(seed)
+    high = rng.choice(models.ACCURACY_LEVELS, size=(num_players, 3), p=models.PROBS_DOMINANT)
+    low = rng.choice(models.ACCURACY_LEVELS, size=(num_players, 3), p=models.PROBS_INVERSE)
+    draws = rng.random((4, num_players, num_rounds))
+    trials = {}
+    for i in range(num_players):
+        for r in range(num_rounds):
+            block = min(r // models.ROUNDS_PER_BLOCK, 2)
+            trials[i, r] = (draws[0, i, r] < 0.5, draws[1, i, r] < high[i, block],
+                            draws[2, i, r] < low[i, block], draws[3, i, r] < 0.5)
+    return trials
+
+def test_schedule_flags_unpack_to_the_drawn_trials():
+    num_players, seed = 4, 2024
+    schedule = models.build_schedule(np.random.default_rng(seed), num_players)
+    flags = schedule['flags']
+    assert flags.dtype == np.uint8 and flags.shape == (num_players, models.Constants.num_rounds)
+    for (i, r), (true_red, high_correct, low_correct, passive_high) in reference_trials(seed, num_players).items():
+        assert bool(flags[i, r] & models.TRUE_RED) == true_red
+        assert bool(flags[i, r] & models.HIGH_CORRECT) == high_correct
+        assert bool(flags[i, r] & models.LOW_CORRECT) == low_correct
+        assert bool(flags[i, r] & models.PASSIVE_HIGH) == passive_high
+
+def test_later_rounds_only_read_the_round_1_schedule(artifact_dir, monkeypatch):
+    num_players, seed = 4, 7
+    calls = []
+    build_schedule = models.build_schedule
+    monkeypatch.setattr(models, 'build_schedule', lambda *args, **kwargs: calls.append(args) or build_schedule(*args, **kwargs))
+    rounds, schedule = create_session(num_players, seed)
+    assert len(calls) == 1  # Drawn in round 1 only
+
+    trials = reference_trials(seed, num_players)
+    for r, players in enumerate(rounds):
+        for i, p in enumerate(players):
+            true_red, high_correct, low_correct, passive_high = trials[i, r]
+            assert p.true_color == ('Red' if true_red else 'Blue')
+            assert (p.advice_high == p.true_color) == high_correct
+            assert (p.advice_low == p.true_color) == low_correct
+            assert p.block_type == schedule['block_order'][i][min(r // models.ROUNDS_PER_BLOCK, 2)]
+            if p.block_type == 'Passive':
+                assert p.selected_advisor_type == ('High' if passive_high else 'Low')
+            else:
+                assert p.selected_advisor_type is None  # Chosen by the participant
+
+def test_beliefs_follow_the_posterior_of_each_block(artifact_dir):
+    rounds, _ = create_session(1, seed=5)
+    priors = [dict(zip(models.ACCURACY_LEVELS, probs)) for probs in (models.PROBS_DOMINANT, models.PROBS_INVERSE)]
+    means = [Gittins.posterior_means(prior, models.ROUNDS_PER_BLOCK) for prior in priors]
+    counts = None
+    for r, (p,) in enumerate(rounds):
+        block = min(r // models.ROUNDS_PER_BLOCK, 2)
+        if r % models.ROUNDS_PER_BLOCK == 0:
+            counts = [[0, 0], [0, 0]]  # [successes, failures] of High and Low; new advisors each block
+        if p.selected_advisor_type is None:  # Active round: alternate, so both advisors are observed
+            p.selected_advisor_type = 'High' if r % 2 == 0 else 'Low'
+        low = p.selected_advisor_type == 'Low'
+        correct = (p.advice_low if low else p.advice_high) == p.true_color
+        counts[low][0 if correct else 1] += 1
+        p.update_beliefs()
+
+        beliefs = p.participant.beliefs
+        for advisor in (0, 1):
+            stored = np.dot(beliefs[2 * block + advisor], models.ACCURACY_LEVELS)
+            assert stored == pytest.approx(means[advisor][tuple(counts[advisor])], abs=1e-12)
+        for later in range(2 * block + 2, len(models.ADVISORS)):  # Advisors of later blocks: still at their prior
+            assert beliefs[later] == pytest.approx(list(priors[later % 2].values()), abs=1e-12)
@@ -0,0 +1,117 @@
+from otree.api import Bot, Submission  # type: ignore[import-untyped]
+from collections import defaultdict
+import asyncio
+import random
+import time
+
+from . import pages
+from .models import Constants, stimulus_pixels
+
+# --- Bots for `otree test` and the load test (loadtest.py) ---
+# Every bot plays the whole page_sequence (or the single Trial page with trial_mode='live').
+# Advisor choices come from the policy named in session config 'bot_policy' (see BOT_POLICIES).
+
+def random_advisor(player):
+    return random.choice(['High', 'Low'])
+
+def always_high(player):
+    return 'High'
+
+def gittins_advisor(player):
+    """The DP-optimal choice for this participant's advice so far (Player.optimal_advisor)."""
+    return player.optimal_advisor()[0]
+
+BOT_POLICIES = {
+    'random': random_advisor,
+    'high': always_high,
+    'gittins': gittins_advisor,
+}
+
+# Server time per submitted page (ms), filled in by loadtest.py and by call_live_method
+LATENCIES = defaultdict(list)
+# Participant codes whose bots run in this process (loadtest.py --processes), or None for all of them.
+# call_live_method plays a whole group, so each process only plays its own participants' live trials.
+PLAYING = None
+
+def bot_policy(session):
+    name = session.config.get('bot_policy', 'random')
+    if name not in BOT_POLICIES:
+        raise ValueError(f"Unknown bot_policy {name!r}; choose one of {', '.join(BOT_POLICIES)}")
+    return BOT_POLICIES[name]
+
+def initial_guess(player):
+    """Majority color of the image, as a participant who looked carefully would answer."""
+    red = stimulus_pixels(player.stimulus).mean() > 0.5
+    return 'Red' if red else 'Blue'
+
+def survey_answers():
+    return dict(confidence_high=random.choice([80, 60, 40, 20]), confidence_low=random.choice([80, 60, 40, 20]),
+                pay_high=random.randint(0, 20), pay_low=random.randint(0, 20))
+
+
+class PlayerBot(Bot):
+    def play_round(self):
+        rpb = Constants.rounds_per_block
+        if self.round_number == 1:
+            yield pages.Welcome
+            yield pages.AdvisorOddsIntro
+        if self.round_number in (1, 1 + rpb, 1 + 2 * rpb):
+            yield pages.BlockIntro
+
+        if pages.live_trials(self.session):
+            yield Submission(pages.Trial, check_html=False)  # Steps are sent by call_live_method
+        else:
+            yield Submission(pages.ViewImage, {}, check_html=False)
+            guess = initial_guess(self.player)
+            yield pages.InitialPrediction, dict(initial_prediction=guess, initial_confidence=random.randint(50, 100))
+            if self.player.block_type == 'Active':
+                yield pages.AdvisorSelection, dict(selected_advisor_type=bot_policy(self.session)(self.player))
+            yield pages.AdvisorDisplay
+            yield pages.FinalPrediction, dict(final_prediction=guess, final_confidence=random.randint(50, 100))
+            yield pages.Feedback
+
+        if self.round_number % rpb == 0:
+            survey = [pages.Block1EndSurvey, pages.Block2EndSurvey, pages.Block3EndSurvey][self.round_number // rpb - 1]
+            yield Submission(survey, check_html=False)  # Answers are sent by call_live_method
+            assert self.player.block_survey() is not None
+
+        # Every trial was scored (calculate_payoff) and every Active choice benchmarked
+        assert self.player.is_correct == (self.player.final_prediction == self.player.true_color)
+        if self.player.block_type == 'Active':
+            assert self.player.optimal_choice in ('High', 'Low')
+
+
+def _replies(method_call):
+    """Runs one live_method call (an async generator under oTree's bot runner) to completion."""
+    async def collect():
+        return [reply async for reply in method_call]
+    return asyncio.run(collect())
+
+def playing(group):
+    """Players of the group whose bots run in this process."""
+    return [p for p in group.get_players() if PLAYING is None or p.participant.code in PLAYING]
+
+def call_live_method(method, round_number, page_class, group, **kwargs):
+    """Answers a block-end survey, or plays one live Trial one step message at a time, for every player of the group."""
+    if issubclass(page_class, pages.BlockEndSurvey):
+        for player in playing(group):
+            for reply in _replies(method(player.id_in_group, survey_answers())):
+                assert reply[player.id_in_group] == {'saved': True}, reply
+        return
+    if page_class is not pages.Trial:
+        return
+    for player in playing(group):
+        player.show_image()
+        player.image_shown_at -= Constants.image_seconds  # Bots do not wait out the image step
+        policy = bot_policy(player.session)
+        guess = initial_guess(player)
+        steps = [dict(step='initial', prediction=guess, confidence=random.randint(50, 100))]
+        if player.block_type == 'Active':
+            steps.append(dict(step='select', advisor=policy(player)))
+        steps.append(dict(step='final', prediction=guess, confidence=random.randint(50, 100)))
+        for data in steps:
+            start = time.perf_counter()
+            replies = _replies(method(player.id_in_group, data))
+            LATENCIES[f"Trial.{data['step']}"].append((time.perf_counter() - start) * 1000)
+            for reply in replies:
+                assert 'error' not in reply[player.id_in_group], reply
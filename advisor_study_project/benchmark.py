@@ -0,0 +1,164 @@
+"""
+Benchmarks for the optimal-policy solver, the simulator and oTree session setup.
+
+    python benchmark.py                          # full grid, results to benchmark_results.json
+    python benchmark.py --quick                  # small grid for a fast check
+    python benchmark.py --save-baseline          # also store the results as benchmark_baseline.json
+    python benchmark.py --compare                # flag cases slower than the baseline (exit code 1)
+                                                 # by more than --tolerance and --floor-ms
+
+Each case records wall time (best of --repeat runs), peak traced memory (a separate run under
+tracemalloc, so tracing does not distort the timing) and, for solver cases, DPSolver cache hits.
+Session setup runs the real Subsession.creating_session through oTree's in-memory SQLite database.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from advisor_experiment import Gittins  # noqa: E402
+
+FULL = dict(horizons=[20, 40, 60, 120], runs=[10**3, 10**4, 10**5, 10**6], participants=[10, 100, 1000, 5000])
+QUICK = dict(horizons=[20, 40], runs=[10**3, 10**4], participants=[10, 100])
+
+
+def measure(fn, repeat):
+    """Best wall time over `repeat` runs, then peak traced memory of one more run."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': min(times), 'peak_mb': peak / 2**20}
+
+
+def cache_stats(before, after):
+    hits = after['hits'] - before['hits']
+    misses = after['misses'] - before['misses']
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses else None}
+
+
+def solver_cases(grid, repeat):
+    results = {}
+    for horizon in grid['horizons']:
+        def cold():
+            Gittins.solver.clear()
+            Gittins.solve_dp(Gittins.PRIOR_A, Gittins.PRIOR_B, horizon)
+        results[f'solve_dp[H={horizon}]'] = measure(cold, repeat)
+
+        # Warm: the table is already cached, every call should be a hit
+        Gittins.solve_dp(Gittins.PRIOR_A, Gittins.PRIOR_B, horizon)
+        before = Gittins.solver.cache_info()
+        record = measure(lambda: Gittins.solve_dp(Gittins.PRIOR_A, Gittins.PRIOR_B, horizon), repeat)
+        record['cache'] = cache_stats(before, Gittins.solver.cache_info())
+        results[f'solve_dp_cached[H={horizon}]'] = record
+
+        policy = Gittins.solve_dp(Gittins.PRIOR_A, Gittins.PRIOR_B, horizon)
+        results[f'generate_heatmap_data[H={horizon}]'] = measure(lambda: Gittins.generate_heatmap_data(policy), repeat)
+    return results
+
+
+def simulation_cases(grid, repeat):
+    policy = Gittins.solve_dp(Gittins.PRIOR_A, Gittins.PRIOR_B, Gittins.HORIZON)
+    return {f'run_simulation[n={n}]': measure(lambda: Gittins.run_simulation(policy, n, seed=0), repeat)
+            for n in grid['runs']}
+
+
+def session_cases(grid, repeat):
+    # oTree reads these at import time: in-memory SQLite, settings from this folder
+    os.environ['OTREE_IN_MEMORY'] = '1'
+    os.chdir(HERE)
+    from otree.main import setup  # type: ignore[import-untyped]
+    from otree.database import session_scope  # type: ignore[import-untyped]
+    from otree.session import create_session  # type: ignore[import-untyped]
+    setup()
+
+    def create(n):
+        with session_scope():
+            create_session('advisor_study', num_participants=n)
+    return {f'creating_session[participants={n}]': measure(lambda: create(n), repeat)
+            for n in grid['participants']}
+
+
+SUITES = {'solver': solver_cases, 'simulation': simulation_cases, 'session': session_cases}
+
+
+def compare(results, baseline, tolerance, floor_ms=1.0):
+    """
+    Cases more than `tolerance` (fractional) slower than the baseline, and by more than `floor_ms`:
+    sub-millisecond cases vary by several times between runs and would otherwise always be flagged.
+    """
+    regressions = []
+    for name, record in results.items():
+        old = baseline.get('results', {}).get(name)
+        if old and record['seconds'] - old['seconds'] > max(tolerance * old['seconds'], floor_ms / 1000):
+            regressions.append((name, old['seconds'], record['seconds']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--suite', choices=sorted(SUITES), nargs='+', default=sorted(SUITES))
+    parser.add_argument('--quick', action='store_true', help="small grid instead of the full one")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=os.path.join(HERE, 'benchmark_results.json'))
+    parser.add_argument('--baseline', default=os.path.join(HERE, 'benchmark_baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true', help="exit with status 1 if any case regressed")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown vs baseline (default 25%%)")
+    parser.add_argument('--floor-ms', type=float, default=1.0, help="slowdowns below this are never flagged (default 1 ms)")
+    args = parser.parse_args(argv)
+
+    grid = QUICK if args.quick else FULL
+    results = {}
+    for suite in args.suite:
+        for name, record in SUITES[suite](grid, args.repeat).items():
+            results[name] = record
+            print(f"{name:45s} {record['seconds'] * 1000:10.1f} ms {record['peak_mb']:9.1f} MB")
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.floor_ms)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Load test: oTree bots (advisor_experiment/tests.py) play whole sessions through the real server stack.
+
+    python loadtest.py                                    # 20 bots, random policy, in-memory SQLite
+    python loadtest.py --participants 200 --policy gittins
+    python loadtest.py --config advisor_study_live        # single-page live trials
+    python loadtest.py --database-url postgresql://user:pw@localhost/loadtest
+    python loadtest.py --participants 40 --processes 8 --database-url postgresql://user:pw@localhost/loadtest
+
+Every page submission (POST plus the redirect to the next page) is timed per page class, and every
+live_method step per step. Reports latency percentiles per page and throughput in trials per second.
+With --processes 1 (the default) all bots share one process and are played round-robin, as in
+`otree test`, so latencies are server time per request without network or concurrency effects.
+With --processes N the bots of one session are split over N processes that play at the same time
+against the same database, as a lab moving through page_sequence together would; this needs a
+database the processes can share (--database-url, e.g. Postgres).
+
+Runs the oTree app in-process through oTree internals (otree.main.setup, otree.bots.runner's
+SessionBotRunner and make_bots, Session.mock_exogenous_data, otree.database), as of otree 6.0.7,
+the version pinned in requirements.txt. Check them when upgrading oTree.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+PERCENTILES = [50, 90, 99]
+
+
+def timed_submit(bot, latencies):
+    """Wraps one ParticipantBot's submit so each page's server time is recorded."""
+    submit = bot.submit
+
+    def submit_and_time(submission):
+        started = time.perf_counter()
+        submit(submission)
+        latencies[submission.page_class.__name__].append((time.perf_counter() - started) * 1000)
+    bot.submit = submit_and_time
+
+
+def setup_otree(database_url=None):
+    """Points oTree at the database (read at import time) and loads the project in this folder."""
+    if database_url:
+        os.environ['DATABASE_URL'] = database_url
+    else:
+        os.environ['OTREE_IN_MEMORY'] = '1'
+    os.chdir(HERE)
+    from otree.main import setup  # type: ignore[import-untyped]
+    setup()
+    logging.getLogger('otree.bots').setLevel(logging.WARNING)  # One 'Submit ...' line per page otherwise
+
+
+def play_bots(session_id, share=0, processes=1):
+    """Plays every processes-th bot of the session, starting at `share`; returns the latencies by page."""
+    from otree.bots.runner import SessionBotRunner, make_bots  # type: ignore[import-untyped]
+    from advisor_experiment import tests
+
+    bots = make_bots(session_pk=session_id, case_number=0, use_browser_bots=False)[share::processes]
+    tests.PLAYING = {bot.participant_code for bot in bots}
+    tests.LATENCIES.clear()
+    for bot in bots:
+        timed_submit(bot, tests.LATENCIES)
+    SessionBotRunner(bots=bots).play()
+    return dict(tests.LATENCIES)
+
+
+def play_share(database_url, session_id, share, processes):
+    """Entry point of one --processes worker: its own oTree setup on the shared database."""
+    setup_otree(database_url)
+    return play_bots(session_id, share, processes)
+
+
+def run(config_name, participants, policy, processes=1, database_url=None):
+    from otree.database import db  # type: ignore[import-untyped]
+    from otree.session import create_session  # type: ignore[import-untyped]
+    from advisor_experiment import models
+
+    started = time.perf_counter()
+    session = create_session(config_name, num_participants=participants,
+                             modified_session_config_fields={'bot_policy': policy})
+    setup_seconds = time.perf_counter() - started
+    session.mock_exogenous_data()
+    db.commit()
+
+    started = time.perf_counter()
+    if processes == 1:
+        latencies = play_bots(session.id)
+    else:
+        latencies = {}
+        with multiprocessing.get_context('spawn').Pool(processes) as pool:
+            shares = [(database_url, session.id, share, processes) for share in range(processes)]
+            for share_latencies in pool.starmap(play_share, shares):
+                for page, values in share_latencies.items():
+                    latencies.setdefault(page, []).extend(values)
+    play_seconds = time.perf_counter() - started
+
+    trials = participants * models.Constants.num_rounds
+    return {
+        'config': config_name,
+        'participants': participants,
+        'policy': policy,
+        'processes': processes,
+        'creating_session_seconds': setup_seconds,
+        'play_seconds': play_seconds,
+        'trials': trials,
+        'trials_per_second': trials / play_seconds,
+        'pages': {page: latency_summary(values) for page, values in latencies.items()},
+    }
+
+
+def latency_summary(values):
+    values = np.asarray(values)
+    summary = {'n': len(values), 'mean_ms': float(values.mean()), 'max_ms': float(values.max())}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f'p{p}_ms'] = float(value)
+    return summary
+
+
+def print_report(report):
+    print(f"{report['config']}: {report['participants']} bots in {report['processes']} process(es), "
+          f"policy {report['policy']}")
+    print(f"creating_session {report['creating_session_seconds']:.2f} s, "
+          f"play {report['play_seconds']:.2f} s, {report['trials_per_second']:.1f} trials/s")
+    header = ['n', 'mean'] + [f'p{p}' for p in PERCENTILES] + ['max']
+    print(f"{'page':20s}" + ''.join(f'{column:>10s}' for column in header) + '   (ms)')
+    for page, summary in sorted(report['pages'].items(), key=lambda item: -item[1]['p50_ms']):
+        values = [summary['mean_ms']] + [summary[f'p{p}_ms'] for p in PERCENTILES] + [summary['max_ms']]
+        print(f"{page:20s}{summary['n']:>10d}" + ''.join(f'{value:10.1f}' for value in values))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--config', default='advisor_study', help="session config name (settings.py)")
+    parser.add_argument('--participants', type=int, default=20)
+    parser.add_argument('--policy', default='random', help="bot_policy: random, high or gittins (tests.BOT_POLICIES)")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="play the bots in this many concurrent processes (needs --database-url)")
+    parser.add_argument('--database-url', help="e.g. a local Postgres; default is oTree's in-memory SQLite")
+    parser.add_argument('--output', help="also write the report as JSON")
+    args = parser.parse_args(argv)
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+    if args.processes > 1 and not args.database_url:
+        parser.error("--processes needs --database-url: the in-memory SQLite cannot be shared between processes")
+
+    setup_otree(args.database_url)
+    from advisor_experiment import tests
+    if args.policy not in tests.BOT_POLICIES:
+        parser.error(f"unknown policy {args.policy!r}; choose one of {', '.join(tests.BOT_POLICIES)}")
+
+    report = run(args.config, args.participants, args.policy, args.processes, args.database_url)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,13 @@ SESSION_CONFIGS = [
         app_sequence=['advisor_experiment'],
         num_demo_participants=2,
     ),
+    dict(
+        name='advisor_study_live',
+        display_name="Advisor Study (single-page live trials)",
+        app_sequence=['advisor_experiment'],
+        num_demo_participants=2,
+        trial_mode='live',
+    ),
 ]
 
 # if you set a property in SESSION_CONFIG_DEFAULTS, it will be inherited by all configs
@@ -15,10 +22,24 @@ SESSION_CONFIGS = [
 # e.g. self.session.config['participation_fee']
 
 SESSION_CONFIG_DEFAULTS = dict(
-    real_world_currency_per_point=1.00, participation_fee=6.00, doc=""
+    real_world_currency_per_point=1.00, participation_fee=6.00, doc="",
+    # 'pages': one page per trial step; 'live': each trial on one page over live_method (pages.Trial)
+    trial_mode='pages',
+    # Advisor choices of bots (advisor_experiment/tests.py, loadtest.py): 'random', 'high' or 'gittins'
+    bot_policy='random',
 )
 
-PARTICIPANT_FIELDS = []
+# Drawn once per participant in round 1 (Subsession.creating_session); pages and custom_export look up each block's names and accuracies here
+PARTICIPANT_FIELDS = [
+    'block_order', 'has_switching_cost',
+    'accuracy_A', 'accuracy_B', 'accuracy_C', 'accuracy_D', 'accuracy_E', 'accuracy_F',
+    'advisor_name_A', 'advisor_name_B', 'advisor_name_C', 'advisor_name_D', 'advisor_name_E', 'advisor_name_F',
+    # Running round state, updated in Player.calculate_payoff: advisor chosen last round,
+    # [High correct, High wrong, Low correct, Low wrong] so far in the current block, switches per Active block
+    'last_advisor', 'advice_counts', 'block_switches',
+    # Posterior over ACCURACY_LEVELS for advisors A-F, updated after each trial from the advice shown
+    'beliefs',
+]
 SESSION_FIELDS = []
 
 # ISO-639 code